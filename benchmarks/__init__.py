@@ -0,0 +1,6 @@
+"""
+Offline benchmarks for the DSA Chatbot.
+
+Each module is runnable from the repository root, e.g.
+`python -m benchmarks.embedding_throughput`.
+"""
@@ -0,0 +1,66 @@
+"""
+Chunking benchmark: the three chunk methods in utils/chunk_doc.py versus the
+offset-based fast-tokenizer chunkers.
+
+Each method chunks the same markdown books; the report shows time, chunk
+count and throughput. The decode-based methods and their offset-based
+equivalents use the same token budgets, so their chunk counts should be
+close (chunk text differs slightly: decode lowercases and re-spaces text,
+offset slicing returns it verbatim).
+
+Usage:
+    python -m benchmarks.chunking --files 3
+"""
+
+import argparse
+from pathlib import Path
+
+from transformers import AutoTokenizer
+
+from benchmarks.common import timed
+from utils.chunk_doc import (
+    chunk_markdown,
+    get_cst_token_chunks,
+    get_cst_token_chunks_fast,
+    get_sentence_chunks,
+    get_sentence_chunks_fast,
+)
+from utils.custom_embeddings import DEFAULT_MODEL_NAME
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--md-dir", default="data/md/")
+    parser.add_argument("--files", type=int, default=3, help="Number of markdown books to chunk")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME, help="Tokenizer to chunk with")
+    args = parser.parse_args()
+
+    md_files = sorted(Path(args.md_dir).glob("*.md"))[:args.files]
+    if not md_files:
+        print(f"No markdown files found in {args.md_dir}")
+        return
+    texts = [md_file.read_text() for md_file in md_files]
+    megabytes = sum(len(text.encode("utf-8")) for text in texts) / 1e6
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model, use_fast=True)
+    # Pay for lazy initialisation before timing
+    get_cst_token_chunks_fast(["warm up"], tokenizer)
+
+    methods = [
+        ("1: sentence (decode)", lambda: [get_sentence_chunks(text, tokenizer) for text in texts]),
+        ("1: sentence (offsets)", lambda: get_sentence_chunks_fast(texts, tokenizer)),
+        ("2: CST token (decode)", lambda: [get_cst_token_chunks(text, tokenizer) for text in texts]),
+        ("2: CST token (offsets)", lambda: get_cst_token_chunks_fast(texts, tokenizer)),
+        ("3: recursive character", lambda: [chunk_markdown(md_file, text) for md_file, text in zip(md_files, texts)]),
+    ]
+
+    print(f"{len(texts)} file(s), {megabytes:.1f} MB, tokenizer {args.model}\n")
+    print(f"{'method':<26}{'seconds':>10}{'chunks':>10}{'MB/s':>10}")
+    for name, run in methods:
+        chunks, seconds = timed(run)
+        count = sum(len(file_chunks) for file_chunks in chunks)
+        print(f"{name:<26}{seconds:>10.2f}{count:>10d}{megabytes / max(seconds, 1e-9):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
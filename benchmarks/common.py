@@ -0,0 +1,55 @@
+"""
+Shared helpers for the benchmark scripts.
+"""
+
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter as Rec
+
+DEFAULT_MD_DIR = "data/md/"
+
+
+def load_corpus_chunks(md_dir: str = DEFAULT_MD_DIR, limit: int = None,
+                       chunk_size: int = 2000, chunk_overlap: int = 500) -> List[str]:
+    """
+    Chunk the markdown corpus the same way ingestion does
+
+    Args:
+        md_dir: Directory containing the converted markdown books
+        limit: Maximum number of chunks to return (default: None - all)
+        chunk_size: Splitter chunk size in characters
+        chunk_overlap: Splitter overlap in characters
+
+    Returns:
+        List of chunk texts
+    """
+    text_splitter = Rec(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+    )
+    chunks = []
+    for md_file in sorted(Path(md_dir).glob("*.md")):
+        with open(md_file, "r") as f:
+            chunks.extend(text_splitter.split_text(f.read()))
+        if limit and len(chunks) >= limit:
+            return chunks[:limit]
+    return chunks
+
+
+def timed(fn: Callable, *args, **kwargs) -> Tuple[object, float]:
+    """Run fn and return (result, elapsed seconds)"""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
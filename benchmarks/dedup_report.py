@@ -0,0 +1,58 @@
+"""
+Dry-run near-duplicate report for the markdown corpus.
+
+Chunks the corpus exactly as ingestion does and reports how many chunks the
+SimHash filter would drop at each Hamming distance, per book and overall,
+without touching the vector store. Use it to pick INGEST_DEDUP_MAX_DISTANCE.
+
+Usage:
+    python -m benchmarks.dedup_report --max-distance 0 1 2 3 --show 5
+"""
+
+import argparse
+from pathlib import Path
+
+from utils.chunk_doc import chunk_markdown
+from utils.dedup import SimHashIndex, simhash
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--md-dir", default="data/md/")
+    parser.add_argument("--max-distance", type=int, nargs="+", default=[0, 1, 2, 3])
+    parser.add_argument("--show", type=int, default=0, help="Print this many example duplicate pairs")
+    args = parser.parse_args()
+
+    chunks = []  # (source, text, fingerprint)
+    for md_file in sorted(Path(args.md_dir).glob("*.md")):
+        with open(md_file, "r") as f:
+            for document in chunk_markdown(md_file, f.read()):
+                chunks.append((str(md_file), document.page_content, simhash(document.page_content)))
+    if not chunks:
+        print(f"No chunks found in {args.md_dir}")
+        return
+
+    print(f"Chunks: {len(chunks)}")
+    for max_distance in args.max_distance:
+        index = SimHashIndex(max_distance=max_distance)
+        dropped_by_source = {}
+        examples = []
+        for n, (source, text, fingerprint) in enumerate(chunks):
+            match = index.find(fingerprint)
+            if match is not None:
+                dropped_by_source[source] = dropped_by_source.get(source, 0) + 1
+                if len(examples) < args.show:
+                    examples.append((chunks[int(match[0])][1], text))
+                continue
+            index.add(str(n), fingerprint, source)
+
+        dropped = sum(dropped_by_source.values())
+        print(f"\nmax distance {max_distance}: {dropped} dropped, index {dropped / len(chunks):.1%} smaller")
+        for source, count in sorted(dropped_by_source.items(), key=lambda item: -item[1]):
+            print(f"  {count:6d}  {source}")
+        for kept, duplicate in examples:
+            print(f"  --- kept:      {kept[:120]!r}\n      duplicate: {duplicate[:120]!r}")
+
+
+if __name__ == "__main__":
+    main()
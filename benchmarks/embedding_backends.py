@@ -0,0 +1,80 @@
+"""
+Compare embedding inference backends on the DSA corpus.
+
+For each backend this reports model load time, single-query latency
+(p50/p95), batch throughput and cosine agreement with the PyTorch fp32
+baseline, so EMBEDDING_BACKEND can be chosen from measurements.
+
+Usage:
+    python -m benchmarks.embedding_backends --backends torch int8 onnx onnx-int8
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import load_corpus_chunks, percentile, timed
+from utils.custom_embeddings import EMBEDDING_BACKENDS, MyEmbeddings, get_model_load_stats
+
+SAMPLE_QUERIES = [
+    "what is an array",
+    "binary search",
+    "How does Dijkstra's algorithm work?",
+    "time complexity of merge sort",
+    "difference between a stack and a queue",
+    "Kadane's algorithm for maximum subarray",
+    "how to detect a cycle in a linked list",
+    "explain dynamic programming with an example",
+]
+
+
+def cosine_rows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Row-wise cosine similarity between two equally shaped matrices"""
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return np.sum(a * b, axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--md-dir", default="data/md/")
+    parser.add_argument("--limit", type=int, default=500, help="Number of corpus chunks to embed")
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS), choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--repeats", type=int, default=20, help="Query latency samples per query")
+    args = parser.parse_args()
+
+    texts = load_corpus_chunks(args.md_dir, limit=args.limit)
+    if not texts:
+        print(f"No chunks found in {args.md_dir}")
+        return
+
+    baseline = MyEmbeddings(backend="torch").encode(texts)
+
+    print(f"Chunks: {len(texts)}  Queries: {len(SAMPLE_QUERIES)} x {args.repeats}")
+    print(f"{'backend':<10} {'load s':>7} {'p50 ms':>8} {'p95 ms':>8} {'chunks/s':>9} {'cos mean':>9} {'cos min':>8}")
+    for backend in args.backends:
+        embeddings = MyEmbeddings(backend=backend)
+        try:
+            embeddings.encode(["warmup"])
+        except ImportError as e:
+            print(f"{backend:<10} skipped: {e}")
+            continue
+
+        latencies = []
+        for _ in range(args.repeats):
+            for query in SAMPLE_QUERIES:
+                start = time.perf_counter()
+                embeddings.embed_query(query)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        vectors, seconds = timed(embeddings.encode, texts)
+        agreement = cosine_rows(baseline, vectors)
+        load_seconds = get_model_load_stats().get(f"{embeddings.model_name} ({backend})", 0.0)
+
+        print(f"{backend:<10} {load_seconds:7.2f} {percentile(latencies, 50):8.2f} {percentile(latencies, 95):8.2f} "
+              f"{len(texts) / seconds:9.1f} {agreement.mean():9.4f} {agreement.min():8.4f}")
+
+
+if __name__ == "__main__":
+    main()
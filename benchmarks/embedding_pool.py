@@ -0,0 +1,55 @@
+"""
+Scaling benchmark for the multi-process ingestion embedder.
+
+Embeds the same corpus sample with 1, 2, 4, ... worker processes and
+reports chunks/sec and parallel efficiency relative to one process.
+
+Usage:
+    python -m benchmarks.embedding_pool --limit 4000 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+from benchmarks.common import load_corpus_chunks, timed
+from utils.embedding_pool import ParallelEmbeddings
+
+
+def main():
+    cpu_count = os.cpu_count() or 1
+    default_workers = [n for n in (1, 2, 4, 8, 16) if n <= cpu_count]
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--md-dir", default="data/md/")
+    parser.add_argument("--limit", type=int, default=4000, help="Number of chunks to embed")
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers)
+    args = parser.parse_args()
+
+    texts = load_corpus_chunks(args.md_dir, limit=args.limit)
+    if not texts:
+        print(f"No chunks found in {args.md_dir}")
+        return
+
+    print(f"Chunks: {len(texts)}  CPUs: {cpu_count}")
+    baseline_rate = None
+    reference = None
+    for workers in args.workers:
+        with ParallelEmbeddings(workers=workers) as embeddings:
+            # Start the pool (and load the model in every worker) before timing
+            embeddings.encode(texts[:2 * embeddings.shard_size])
+            vectors, seconds = timed(embeddings.encode, texts)
+
+        rate = len(texts) / seconds
+        baseline_rate = baseline_rate or rate
+        if reference is None:
+            reference = vectors
+        max_diff = float(np.max(np.abs(reference - vectors)))
+        print(f"workers={workers:<3} {seconds:8.2f}s  {rate:8.1f} chunks/sec  "
+              f"speedup {rate / baseline_rate:5.2f}x  efficiency {rate / baseline_rate / workers:5.0%}  "
+              f"max abs diff {max_diff:.1e}")
+
+
+if __name__ == "__main__":
+    main()
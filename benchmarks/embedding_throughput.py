@@ -0,0 +1,50 @@
+"""
+Ingestion throughput benchmark: batched MyEmbeddings.encode versus the
+previous one-text-at-a-time loop.
+
+Usage:
+    python -m benchmarks.embedding_throughput --limit 500 --batch-size 64
+"""
+
+import argparse
+
+import numpy as np
+
+from benchmarks.common import load_corpus_chunks, timed
+from utils.custom_embeddings import MyEmbeddings
+
+
+def per_text_loop(embeddings: MyEmbeddings, texts):
+    """The original embed_documents implementation"""
+    return [embeddings.model.encode(t).tolist() for t in texts]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--md-dir", default="data/md/")
+    parser.add_argument("--limit", type=int, default=500, help="Number of chunks to embed")
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    texts = load_corpus_chunks(args.md_dir, limit=args.limit)
+    if not texts:
+        print(f"No chunks found in {args.md_dir}")
+        return
+
+    embeddings = MyEmbeddings(batch_size=args.batch_size)
+    # Warm up so neither path pays for lazy initialisation
+    embeddings.encode(texts[:8])
+
+    loop_vectors, loop_seconds = timed(per_text_loop, embeddings, texts)
+    batch_vectors, batch_seconds = timed(embeddings.encode, texts)
+
+    max_diff = float(np.max(np.abs(np.asarray(loop_vectors, dtype=np.float32) - batch_vectors)))
+
+    print(f"Chunks: {len(texts)}")
+    print(f"Per-text loop : {loop_seconds:8.2f}s  {len(texts) / loop_seconds:8.1f} chunks/sec")
+    print(f"Batched (bs={args.batch_size:<3}): {batch_seconds:8.2f}s  {len(texts) / batch_seconds:8.1f} chunks/sec")
+    print(f"Speedup: {loop_seconds / batch_seconds:.2f}x  (max abs diff {max_diff:.2e})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Time-to-first-token with each input gating mode.
+
+For every sample input this runs the input gate (language check + intent
+classification) in each INPUT_GATING mode and then streams the start of an
+answer, so the reported TTFT is what a user waits before the first token
+appears: gating latency plus the answer model's first-token latency. The
+gate's decisions are compared with the serial mode to spot disagreements.
+
+The modes are compared with every language check going to the LLM
+(LANGUAGE_DETECTION=llm); each mode is then run again with local language
+detection in front, reported on its own line with the TTFT speedup and the
+decisions that differ from the LLM-only run. Needs the OpenAI key.
+
+Usage:
+    python -m benchmarks.input_gating --modes serial concurrent combined --repeats 3
+"""
+
+import argparse
+import time
+
+from langchain_core.messages import HumanMessage
+
+from benchmarks.common import percentile
+from benchmarks.embedding_backends import SAMPLE_QUERIES
+from templates.text_template import INPUT_GATING_MODES, gate_input
+from utils.model import get_llm
+
+SAMPLE_INPUTS = SAMPLE_QUERIES + [
+    "hi there!",
+    "thanks, that was helpful",
+    "what's the weather like today?",
+    "¿Qué es un árbol binario?",
+    "explain binary search 二分查找",
+]
+
+
+def decision(language_result, content_result):
+    if language_result.message_type == "non_english":
+        return "non_english"
+    return content_result.message_type
+
+
+def first_token_seconds(question):
+    """Seconds until the answer model streams its first token"""
+    start = time.perf_counter()
+    for chunk in get_llm(temperature=0.5).stream([HumanMessage(content=question)]):
+        if chunk.content:
+            break
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=list(INPUT_GATING_MODES), choices=INPUT_GATING_MODES)
+    parser.add_argument("--repeats", type=int, default=1)
+    args = parser.parse_args()
+
+    # Serial first, so the other modes' decisions can be compared with it
+    modes = sorted(set(args.modes), key=INPUT_GATING_MODES.index)
+    baseline = {}
+    for mode in modes:
+        gate_ms, ttft_ms, local_gate_ms, local_ttft_ms = [], [], [], []
+        disagreements = local_disagreements = 0
+        for _ in range(args.repeats):
+            for text in SAMPLE_INPUTS:
+                messages = [HumanMessage(content=text)]
+                first_token = first_token_seconds(text)
+
+                # The mode itself, with every language check going to the LLM
+                start = time.perf_counter()
+                label = decision(*gate_input(messages, mode, local_language=False))
+                gate_seconds = time.perf_counter() - start
+                gate_ms.append(gate_seconds * 1000)
+                ttft_ms.append((gate_seconds + first_token) * 1000)
+
+                # The same mode with local language detection in front
+                start = time.perf_counter()
+                local_label = decision(*gate_input(messages, mode, local_language=True))
+                local_seconds = time.perf_counter() - start
+                local_gate_ms.append(local_seconds * 1000)
+                local_ttft_ms.append((local_seconds + first_token) * 1000)
+                if local_label != label:
+                    local_disagreements += 1
+                    print(f"  {mode} + local: {text!r} -> {local_label} (LLM: {label})")
+
+                if mode == "serial":
+                    baseline.setdefault(text, label)
+                elif text in baseline and baseline[text] != label:
+                    disagreements += 1
+                    print(f"  {mode}: {text!r} -> {label} (serial: {baseline[text]})")
+
+        local_speedup = percentile(ttft_ms, 50) / max(percentile(local_ttft_ms, 50), 1e-9)
+        print(f"{mode:<11} gate p50 {percentile(gate_ms, 50):6.0f} ms  p95 {percentile(gate_ms, 95):6.0f} ms   "
+              f"TTFT p50 {percentile(ttft_ms, 50):6.0f} ms  p95 {percentile(ttft_ms, 95):6.0f} ms   "
+              f"disagreements {disagreements}")
+        print(f"{'  + local':<11} gate p50 {percentile(local_gate_ms, 50):6.0f} ms  "
+              f"p95 {percentile(local_gate_ms, 95):6.0f} ms   "
+              f"TTFT p50 {percentile(local_ttft_ms, 50):6.0f} ms  p95 {percentile(local_ttft_ms, 95):6.0f} ms   "
+              f"local speedup {local_speedup:.2f}x  disagreements {local_disagreements}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Coverage and accuracy of the embedding kNN intent classifier.
+
+Runs utils.intent_classifier.IntentClassifier over the labeled inputs in
+benchmarks/data/intent_samples.jsonl and reports, for each confidence
+threshold, the share of inputs the app would classify locally (the rest go
+to the LLM), the accuracy of those local decisions, the precision of each label
+among them, and the per-input latency with the bank already embedded.
+
+The app only decides labels locally whose leave-one-out precision on the
+example bank reaches INTENT_MIN_PRECISION; that calibration is printed first.
+Check the held-out per-label precision here (an 'other' mistake turns away a
+DSA question) and raise the threshold or the minimum precision if a label
+falls short.
+
+Usage:
+    python -m benchmarks.intent_classifier --thresholds 0.6 0.7 0.8 0.9 --verbose
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from benchmarks.common import percentile
+from utils.chunk_doc import embedding_func
+from utils.intent_classifier import (DEFAULT_CONFIDENCE_THRESHOLD, DEFAULT_MIN_PRECISION, MIN_CALIBRATION_DECISIONS,
+                                     IntentClassifier)
+
+DEFAULT_SAMPLES = Path(__file__).parent / "data" / "intent_samples.jsonl"
+
+
+def load_samples(path):
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", default=str(DEFAULT_SAMPLES), help="Labeled inputs (JSONL)")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[DEFAULT_CONFIDENCE_THRESHOLD])
+    parser.add_argument("--k", type=int, default=None, help="Neighbours that vote (default: classifier default)")
+    parser.add_argument("--min-precision", type=float, default=DEFAULT_MIN_PRECISION,
+                        help="Leave-one-out precision a label needs to be decided locally")
+    parser.add_argument("--verbose", action="store_true", help="Print every prediction")
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples)
+    classifier = IntentClassifier(embedding_func, min_precision=args.min_precision)
+    if args.k:
+        classifier.k = args.k
+    classifier.predict("warm up")  # embeds the example bank
+
+    # Labels the app would decide locally at each threshold
+    enabled = {}
+    for threshold in args.thresholds:
+        classifier.confidence_threshold = threshold
+        precision = classifier.label_precision()
+        enabled[threshold] = {label for label, (value, total) in precision.items()
+                              if value >= args.min_precision and total >= MIN_CALIBRATION_DECISIONS}
+        print(f"Leave-one-out at threshold {threshold:.2f}: " + ", ".join(
+            f"{label} {value:.1%} ({total})" for label, (value, total) in sorted(precision.items()))
+            + f"; decided locally: {sorted(enabled[threshold]) or 'none'}")
+    print()
+
+    predictions = []
+    latencies_ms = []
+    for item in samples:
+        start = time.perf_counter()
+        predictions.append(classifier.predict(item["text"]))
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+    print(f"{len(samples)} samples, {len(classifier.examples)} examples, k={classifier.k}, "
+          f"p50 {percentile(latencies_ms, 50):.1f} ms, p95 {percentile(latencies_ms, 95):.1f} ms per input\n")
+
+    if args.verbose:
+        for item, (label, confidence, _, similarity) in zip(samples, predictions):
+            mark = "" if label == item["label"] else "WRONG"
+            print(f"  {mark:<6}{item['label']:<11}{label:<11}conf {confidence:.2f}  sim {similarity:.2f}  {item['text']}")
+        print()
+
+    labels = sorted({label for _, label, _ in classifier.examples})
+    print(f"{'threshold':>10}{'coverage':>10}{'accuracy':>10}" + "".join(f"{'P(' + l + ')':>16}" for l in labels))
+    for threshold in args.thresholds:
+        local = [
+            (item["label"], label)
+            for item, (label, confidence, _, similarity) in zip(samples, predictions)
+            if confidence >= threshold and similarity >= classifier.min_similarity and label in enabled[threshold]
+        ]
+        accuracy = sum(expected == label for expected, label in local) / len(local) if local else 0.0
+        precision = []
+        for name in labels:
+            predicted = [expected for expected, label in local if label == name]
+            precision.append(f"{sum(e == name for e in predicted) / len(predicted):>10.1%} ({len(predicted):>3})"
+                             if predicted else f"{'-':>16}")
+        print(f"{threshold:>10.2f}{len(local) / len(samples):>10.1%}{accuracy:>10.1%}" + "".join(precision))
+
+
+if __name__ == "__main__":
+    main()
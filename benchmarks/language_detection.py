@@ -0,0 +1,90 @@
+"""
+Precision/recall of the local language detector on a labeled sample.
+
+Runs utils.language_detection.detect_language over the labeled inputs in
+benchmarks/data/language_samples.jsonl and reports:
+
+    coverage         share of inputs decided locally (the rest go to the LLM)
+    precision/recall per label, over the inputs decided locally
+    latency          mean and p95 microseconds per call
+
+With --llm the ambiguous inputs are sent to the LLM check as in the app, and
+the end-to-end precision/recall is reported as well (needs the OpenAI key).
+
+Usage:
+    python -m benchmarks.language_detection --verbose
+    python -m benchmarks.language_detection --llm
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from benchmarks.common import percentile
+from utils.language_detection import DEFAULT_ENGLISH_MARGIN, DEFAULT_NON_ENGLISH_MARGIN, detect_language
+
+DEFAULT_SAMPLES = Path(__file__).parent / "data" / "language_samples.jsonl"
+LABELS = ("english", "non_english")
+
+
+def load_samples(path):
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def precision_recall(pairs, label):
+    """Precision and recall of one label over (expected, predicted) pairs"""
+    true_positives = sum(1 for expected, predicted in pairs if expected == label and predicted == label)
+    predicted = sum(1 for _, p in pairs if p == label)
+    expected = sum(1 for e, _ in pairs if e == label)
+    return (true_positives / predicted if predicted else 0.0,
+            true_positives / expected if expected else 0.0)
+
+
+def report(title, pairs):
+    print(title)
+    for label in LABELS:
+        precision, recall = precision_recall(pairs, label)
+        print(f"  {label:<12} precision {precision:.3f}  recall {recall:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", default=str(DEFAULT_SAMPLES), help="Labeled inputs (JSONL)")
+    parser.add_argument("--english-margin", type=float, default=DEFAULT_ENGLISH_MARGIN)
+    parser.add_argument("--non-english-margin", type=float, default=DEFAULT_NON_ENGLISH_MARGIN)
+    parser.add_argument("--llm", action="store_true", help="Resolve ambiguous inputs with the LLM check")
+    parser.add_argument("--verbose", action="store_true", help="Print every input that is wrong or ambiguous")
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples)
+    detect_language("warm up")  # builds the trigram model
+
+    latencies_us = []
+    guesses = []
+    for item in samples:
+        start = time.perf_counter()
+        guess = detect_language(item["text"], args.english_margin, args.non_english_margin)
+        latencies_us.append((time.perf_counter() - start) * 1e6)
+        guesses.append(guess)
+        if args.verbose and guess.label != item["label"]:
+            print(f"  {'ambiguous' if guess.label is None else 'WRONG':<10}{item['label']:<12}"
+                  f"{guess.reason:<26}{guess.score:6.2f}  {item['text']}")
+
+    decided = [(item["label"], guess.label) for item, guess in zip(samples, guesses) if guess.label is not None]
+    print(f"{len(samples)} samples, {len(decided)} decided locally (coverage {len(decided) / len(samples):.1%}), "
+          f"mean {sum(latencies_us) / len(latencies_us):.0f} us, p95 {percentile(latencies_us, 95):.0f} us per call\n")
+    report("Local decisions:", decided)
+
+    if args.llm:
+        from templates.text_template import check_language_with_llm
+        pairs = []
+        for item, guess in zip(samples, guesses):
+            label = guess.label or check_language_with_llm(item["text"]).message_type
+            pairs.append((item["label"], label))
+        report("\nLocal + LLM fallback:", pairs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Prompt-size and latency impact of cross-encoder reranking.
+
+For each sample question this retrieves chunks with the workflow retriever,
+then compares the synthesis context with all chunks against the reranked
+top-N: context characters, prompt tokens and rerank latency. With --with-llm
+it also times synthesis end to end (needs the OpenAI key).
+
+Usage:
+    python -m benchmarks.rerank_context --top-n 6 --with-llm
+"""
+
+import argparse
+import time
+
+import numpy as np
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+from benchmarks.common import percentile
+from benchmarks.embedding_backends import SAMPLE_QUERIES
+from templates.text_template import (DOCUMENT_SEPARATOR, RESPONSE_GENERATION_PROMPT,
+                                     get_level_requirements, get_workflow_retriever)
+from utils.model import count_tokens, get_llm
+from utils.reranker import rerank_documents
+
+
+def synthesis_prompt(question, context):
+    return RESPONSE_GENERATION_PROMPT.format(
+        question=question,
+        context=context,
+        level_requirements=get_level_requirements("intermediate"),
+        conversation_history="",
+    )
+
+
+def time_synthesis(question, context):
+    prompt = PromptTemplate(
+        input_variables=['context', 'question', 'level_requirements', 'conversation_history'],
+        template=RESPONSE_GENERATION_PROMPT,
+    )
+    chain = prompt | get_llm(temperature=0.5) | StrOutputParser()
+    start = time.perf_counter()
+    chain.invoke({
+        "context": context,
+        "question": question,
+        "level_requirements": get_level_requirements("intermediate"),
+        "conversation_history": "",
+    })
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top-n", type=int, default=6)
+    parser.add_argument("--with-llm", action="store_true", help="Also time synthesis with the LLM")
+    args = parser.parse_args()
+
+    retriever = get_workflow_retriever()
+    rows = []
+    rerank_ms = []
+    for question in SAMPLE_QUERIES:
+        documents = retriever.invoke(question)
+        if not documents:
+            print(f"{question!r}: no documents retrieved, skipped")
+            continue
+
+        start = time.perf_counter()
+        kept = [doc for doc, _ in rerank_documents(question, documents, top_n=args.top_n)]
+        rerank_ms.append((time.perf_counter() - start) * 1000)
+
+        full_context = DOCUMENT_SEPARATOR.join(doc.page_content for doc in documents)
+        reranked_context = DOCUMENT_SEPARATOR.join(doc.page_content for doc in kept)
+        row = {
+            "question": question,
+            "chunks": (len(documents), len(kept)),
+            "chars": (len(full_context), len(reranked_context)),
+            "tokens": (count_tokens(synthesis_prompt(question, full_context)),
+                       count_tokens(synthesis_prompt(question, reranked_context))),
+        }
+        if args.with_llm:
+            row["seconds"] = (time_synthesis(question, full_context), time_synthesis(question, reranked_context))
+        rows.append(row)
+
+        line = (f"{question[:40]:<40} chunks {row['chunks'][0]:>2} -> {row['chunks'][1]:>2}  "
+                f"prompt tokens {row['tokens'][0]:>6} -> {row['tokens'][1]:>6}")
+        if args.with_llm:
+            line += f"  synthesis {row['seconds'][0]:5.1f}s -> {row['seconds'][1]:5.1f}s"
+        print(line)
+
+    if not rows:
+        return
+    full_tokens = np.mean([row["tokens"][0] for row in rows])
+    reranked_tokens = np.mean([row["tokens"][1] for row in rows])
+    print(f"\nMean prompt tokens: {full_tokens:.0f} -> {reranked_tokens:.0f} "
+          f"({1 - reranked_tokens / full_tokens:.0%} smaller)")
+    print(f"Rerank latency: p50 {percentile(rerank_ms, 50):.0f} ms  p95 {percentile(rerank_ms, 95):.0f} ms")
+    if args.with_llm:
+        full_s = np.mean([row["seconds"][0] for row in rows])
+        reranked_s = np.mean([row["seconds"][1] for row in rows])
+        print(f"Mean synthesis latency: {full_s:.2f}s -> {reranked_s:.2f}s "
+              f"(+{np.mean(rerank_ms) / 1000:.2f}s rerank)")
+
+
+if __name__ == "__main__":
+    main()
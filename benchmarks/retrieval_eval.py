@@ -0,0 +1,271 @@
+"""
+Offline retrieval evaluation and latency harness.
+
+Runs the labeled DSA questions in benchmarks/data/dsa_questions.jsonl
+against a retriever and reports, per configuration:
+
+    recall@k        share of each question's labeled passages found among the
+                    top-k chunks (averaged over questions)
+    MRR             mean reciprocal rank of the first chunk that is one of the
+                    labeled passages
+    chunks          mean number of chunks returned
+    prompt tokens   mean tokens of the joined retrieved context
+    p50/p95 ms      search latency (query embeddings are computed once up
+                    front, so this is the vector search itself)
+
+Each question labels one or more passages rather than chunk ids, so the
+labels stay valid when the chunk size or chunk method changes. A passage is
+an optional source file glob plus distinctive phrases; a chunk counts as that
+passage only if it comes from a matching source and contains every phrase as
+whole words. --list-matches prints which chunks each label matches, to pin
+sources and tighten labels that match too much of the corpus.
+
+By default the harness is hermetic: it chunks data/md/ with the requested
+method and sizes into a throwaway local index under data/index/eval/ (reused
+across runs with the same configuration, and embedded through the
+persistent embedding cache). It needs no secrets and no network once the
+embedding model and tokenizer are in the local Hugging Face cache (set
+HF_HUB_OFFLINE=1 to make sure) and tiktoken's o200k_base file is in
+TIKTOKEN_CACHE_DIR for the prompt token counts; without that file the
+counts are approximated with the MiniLM tokenizer. --retriever workflow
+evaluates the app's get_retriever() instead, which uses the configured
+vector store.
+
+Usage:
+    python -m benchmarks.retrieval_eval --chunk-method recursive --chunk-size 2000 --chunk-overlap 500 \\
+        --k 10 25 --score-threshold 0.8
+    python -m benchmarks.retrieval_eval --retriever workflow --json results.json
+    python -m benchmarks.retrieval_eval --list-matches
+"""
+
+import argparse
+import fnmatch
+import hashlib
+import json
+import re
+import shutil
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter as Rec
+
+from benchmarks.common import percentile
+from utils.chunk_doc import embedding_func, get_cst_token_chunks_fast, get_retriever, get_sentence_chunks_fast
+from utils.custom_embeddings import DEFAULT_MODEL_NAME
+from utils.local_vector_store import LocalVectorStore
+from utils.model import count_tokens
+
+DEFAULT_QUESTIONS = Path(__file__).parent / "data" / "dsa_questions.jsonl"
+EVAL_INDEX_DIR = "data/index/eval"
+CHUNK_METHODS = ("recursive", "cst", "sentence")
+CONTEXT_SEPARATOR = "\n\n"
+
+
+def load_questions(path):
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def chunk_corpus(md_dir, method, chunk_size, chunk_overlap):
+    """
+    Chunk every markdown file with one of the chunk methods
+
+    chunk_size and chunk_overlap are characters for 'recursive' and tokens
+    for 'cst' and 'sentence'.
+    """
+    md_files = sorted(Path(md_dir).glob("*.md"))
+    texts = [md_file.read_text() for md_file in md_files]
+    if method == "recursive":
+        splitter = Rec(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len)
+        per_file = [splitter.split_text(text) for text in texts]
+    else:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(DEFAULT_MODEL_NAME, use_fast=True)
+        if method == "cst":
+            per_file = get_cst_token_chunks_fast(texts, tokenizer, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        else:
+            per_file = get_sentence_chunks_fast(texts, tokenizer, max_chunk_size=chunk_size,
+                                                min_chunk_size=min(150, chunk_size // 2), overlap_size=chunk_overlap)
+    return [
+        Document(page_content=chunk, metadata={"source": str(md_file)})
+        for md_file, chunks in zip(md_files, per_file)
+        for chunk in chunks
+    ]
+
+
+def build_eval_index(md_dir, method, chunk_size, chunk_overlap, rebuild=False):
+    """Build (or reuse) a local index for one chunking configuration"""
+    corpus_state = sorted((str(p), p.stat().st_size, p.stat().st_mtime_ns) for p in Path(md_dir).glob("*.md"))
+    key = hashlib.sha256(json.dumps(
+        [corpus_state, method, chunk_size, chunk_overlap, getattr(embedding_func, "model_id", DEFAULT_MODEL_NAME)]
+    ).encode("utf-8")).hexdigest()[:12]
+    index_path = Path(EVAL_INDEX_DIR) / f"{method}-{chunk_size}-{chunk_overlap}-{key}"
+
+    if rebuild:
+        shutil.rmtree(index_path, ignore_errors=True)
+    store = LocalVectorStore(embedding_function=embedding_func, index_path=str(index_path))
+    if len(store):
+        print(f"Reusing eval index {index_path} ({len(store)} chunks)")
+        return store
+
+    documents = chunk_corpus(md_dir, method, chunk_size, chunk_overlap)
+    if not documents:
+        raise SystemExit(f"No chunks produced from {md_dir}")
+    start = time.perf_counter()
+    texts = [document.page_content for document in documents]
+    store.add_embeddings(texts, embedding_func.encode(texts).tolist(), [document.metadata for document in documents])
+    store.flush()
+    print(f"Built eval index {index_path}: {len(documents)} chunks in {time.perf_counter() - start:.1f}s")
+    return store
+
+
+def phrase_pattern(phrase):
+    """
+    Whole-word, case-insensitive pattern for a label phrase
+
+    Spaces and hyphens between words are interchangeable ("first-in, first-out"
+    matches "first in, first out"), and a trailing '*' allows any word ending
+    ("memoiz*" matches "memoize" and "memoization"). Without it "prim" doesn't
+    match "primary" and "trie" doesn't match "retrieve".
+    """
+    stem = phrase.endswith("*")
+    words = re.split(r"[\s-]+", phrase.rstrip("*").strip())
+    body = r"[\s-]+".join(re.escape(word) for word in words)
+    return re.compile(r"(?<!\w)" + body + (r"\w*" if stem else r"(?!\w)"), re.IGNORECASE)
+
+
+def compile_passages(item):
+    """Labeled passages of a question as (source glob, phrase patterns)"""
+    return [
+        (passage.get("source"), [phrase_pattern(phrase) for phrase in passage["phrases"]])
+        for passage in item["passages"]
+    ]
+
+
+def matches_passage(document, passage):
+    """A chunk is the labeled passage if it comes from its source and contains every phrase"""
+    source, patterns = passage
+    if source and not fnmatch.fnmatch(Path(document.metadata.get("source", "")).name, source):
+        return False
+    return all(pattern.search(document.page_content) for pattern in patterns)
+
+
+def first_relevant_rank(documents, passages):
+    for rank, document in enumerate(documents, start=1):
+        if any(matches_passage(document, passage) for passage in passages):
+            return rank
+    return None
+
+
+def passage_recall(documents, passages):
+    found = sum(any(matches_passage(document, passage) for document in documents) for passage in passages)
+    return found / len(passages)
+
+
+def list_matches(documents, questions):
+    """Print which corpus chunks each label matches, to pin sources and spot vague labels"""
+    for item in questions:
+        print(item["question"])
+        for raw, passage in zip(item["passages"], compile_passages(item)):
+            sources = Counter(Path(d.metadata.get("source", "")).name for d in documents
+                              if matches_passage(d, passage))
+            summary = ", ".join(f"{name} ({count})" for name, count in sources.most_common(5)) or "NO MATCH"
+            print(f"  {raw.get('source') or '*'} {raw['phrases']}: {sum(sources.values())} chunks  {summary}")
+
+
+def evaluate(retriever, questions, k, repeats=1):
+    """Run every question through a retriever and aggregate the metrics"""
+    latencies = []
+    rows = []
+    for item in questions:
+        passages = compile_passages(item)
+        for _ in range(repeats):
+            start = time.perf_counter()
+            documents = retriever.invoke(item["question"])
+            latencies.append((time.perf_counter() - start) * 1000)
+        top_k = documents[:k]
+        rank = first_relevant_rank(top_k, passages)
+        rows.append({
+            "question": item["question"],
+            "recall": passage_recall(top_k, passages),
+            "reciprocal_rank": 1 / rank if rank else 0.0,
+            "chunks": len(documents),
+            "prompt_tokens": count_tokens(CONTEXT_SEPARATOR.join(d.page_content for d in documents)) if documents else 0,
+        })
+    return {
+        "k": k,
+        f"recall@{k}": float(np.mean([row["recall"] for row in rows])),
+        "mrr": float(np.mean([row["reciprocal_rank"] for row in rows])),
+        "chunks": float(np.mean([row["chunks"] for row in rows])),
+        "prompt_tokens": float(np.mean([row["prompt_tokens"] for row in rows])),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "questions": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", default=str(DEFAULT_QUESTIONS), help="Labeled questions (JSONL)")
+    parser.add_argument("--retriever", choices=["local", "workflow"], default="local")
+    parser.add_argument("--md-dir", default="data/md/")
+    parser.add_argument("--chunk-method", choices=CHUNK_METHODS, default="recursive")
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--chunk-overlap", type=int, default=500)
+    parser.add_argument("--k", type=int, nargs="+", default=[25], help="One or more k values to compare")
+    parser.add_argument("--score-threshold", type=float, default=0.8)
+    parser.add_argument("--repeats", type=int, default=1, help="Times each question is searched (for latency)")
+    parser.add_argument("--rebuild", action="store_true", help="Re-chunk and re-embed the eval index")
+    parser.add_argument("--verbose", action="store_true", help="Print per-question results")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--list-matches", action="store_true",
+                        help="Print the chunks each label matches in the chunked corpus and exit")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    if args.list_matches:
+        list_matches(chunk_corpus(args.md_dir, args.chunk_method, args.chunk_size, args.chunk_overlap), questions)
+        return
+    if args.retriever == "local":
+        store = build_eval_index(args.md_dir, args.chunk_method, args.chunk_size, args.chunk_overlap, args.rebuild)
+        config = f"local {args.chunk_method} size {args.chunk_size} overlap {args.chunk_overlap}"
+    else:
+        store = None
+        config = "workflow get_retriever()"
+
+    # Embed the questions once (kept in the query cache) so latency measures the search only
+    for item in questions:
+        embedding_func.embed_query(item["question"])
+
+    print(f"{len(questions)} questions, {config}, score threshold {args.score_threshold}\n")
+    print(f"{'k':>4}{'recall@k':>10}{'MRR':>8}{'chunks':>8}{'prompt tok':>12}{'p50 ms':>9}{'p95 ms':>9}")
+    results = []
+    for k in args.k:
+        if store is not None:
+            retriever = store.as_retriever(
+                search_type="similarity_score_threshold",
+                search_kwargs={'k': k, 'score_threshold': args.score_threshold},
+            )
+        else:
+            retriever = get_retriever()
+            retriever.k, retriever.score_threshold = k, args.score_threshold
+        result = evaluate(retriever, questions, k, args.repeats)
+        results.append(result)
+        print(f"{k:>4}{result[f'recall@{k}']:>10.3f}{result['mrr']:>8.3f}{result['chunks']:>8.1f}"
+              f"{result['prompt_tokens']:>12.0f}{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}")
+        if args.verbose:
+            for row in result["questions"]:
+                print(f"      {row['question'][:50]:<50} recall {row['recall']:.2f}  RR {row['reciprocal_rank']:.2f}  "
+                      f"chunks {row['chunks']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": config, "score_threshold": args.score_threshold, "results": results}, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Search latency of the local brute-force index versus Zilliz FLAT/COSINE.
+
+Runs the same queries through both backends' retrievers (k=25,
+score_threshold=0.8, as in get_retriever) and reports p50/p95 latency and
+the overlap of the returned chunk texts. Pass --synthetic N to also time the
+raw NumPy search over N random 384-d vectors, to see how the local index
+scales past the current corpus size.
+
+Build the local index first:
+    VECTOR_STORE_BACKEND=local python -c "from utils.chunk_doc import split_chunks; split_chunks()"
+
+Usage:
+    python -m benchmarks.vector_index --backends local zilliz --synthetic 200000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import percentile
+from benchmarks.embedding_backends import SAMPLE_QUERIES
+from utils.chunk_doc import VECTOR_STORE_BACKENDS, create_vector_store, embedding_func
+
+
+def time_backend(backend, queries, repeats):
+    store = create_vector_store(backend)
+    retriever = store.as_retriever(
+        search_type="similarity_score_threshold",
+        search_kwargs={'k': 25, 'score_threshold': 0.8},
+    )
+    # Embed every query once so only the search itself is timed
+    for query in queries:
+        embedding_func.embed_query(query)
+
+    latencies = []
+    results = {}
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            docs = retriever.invoke(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+            results[query] = {doc.page_content for doc in docs}
+    return latencies, results
+
+
+def time_synthetic(n, dim=384, k=25, repeats=50):
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((n, dim), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    latencies = []
+    for _ in range(repeats):
+        query = rng.standard_normal(dim, dtype=np.float32)
+        start = time.perf_counter()
+        scores = matrix @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        top[np.argsort(-scores[top])]
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["local"], choices=VECTOR_STORE_BACKENDS)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--synthetic", type=int, default=0, help="Also time raw search over N random vectors")
+    args = parser.parse_args()
+
+    all_results = {}
+    for backend in args.backends:
+        latencies, results = time_backend(backend, SAMPLE_QUERIES, args.repeats)
+        all_results[backend] = results
+        returned = np.mean([len(docs) for docs in results.values()])
+        print(f"{backend:<7} p50 {percentile(latencies, 50):7.2f} ms  p95 {percentile(latencies, 95):7.2f} ms  "
+              f"avg chunks returned {returned:.1f}")
+
+    if "local" in all_results and "zilliz" in all_results:
+        overlaps = []
+        for query in SAMPLE_QUERIES:
+            local_docs, remote_docs = all_results["local"][query], all_results["zilliz"][query]
+            union = local_docs | remote_docs
+            overlaps.append(len(local_docs & remote_docs) / len(union) if union else 1.0)
+        print(f"Result overlap (Jaccard) local vs zilliz: {np.mean(overlaps):.3f}")
+
+    if args.synthetic:
+        latencies = time_synthetic(args.synthetic)
+        print(f"numpy brute force over {args.synthetic} vectors: p50 {percentile(latencies, 50):.2f} ms  "
+              f"p95 {percentile(latencies, 95):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
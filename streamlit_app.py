@@ -9,11 +9,13 @@ from yaml.loader import SafeLoader
 from utils.model import get_llm
 from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage
 from utils.chunk_doc import get_retriever
+from utils.custom_embeddings import warmup_embedding_model
 from utils.document_processing import process_image, process_pdf
 import json
 import re
 import os
 import time
+import threading
 
 import streamlit_authenticator as stauth
 from streamlit_authenticator.utilities import (LoginError, RegisterError,)
@@ -75,6 +77,20 @@ def get_database():
 
 db = get_database()
 
+# Load the embedding model once per process, in the background
+@st.cache_resource
+def start_embedding_warmup():
+    def warmup():
+        try:
+            seconds = warmup_embedding_model()
+            logger.info(f"Embedding model warmed up (load {seconds:.2f}s)")
+        except Exception as e:
+            logger.warning(f"Embedding model warmup failed: {e}")
+
+    thread = threading.Thread(target=warmup, name="embedding-warmup", daemon=True)
+    thread.start()
+    return thread
+
 cookie_session_available = authenticator.cookie_controller.get_cookie()
 
 # Set default authentication status
@@ -943,4 +959,7 @@ else:
     # Render the selected page
     page_names_to_funcs[page_name]()
 
+# Started after the page is rendered, so the model load doesn't delay the UI
+start_embedding_warmup()
+
         
\ No newline at end of file
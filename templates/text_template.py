@@ -7,11 +7,14 @@ and generating level-appropriate responses.
 """
 
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Annotated, Dict, List, Literal, Sequence, Any, Optional, Tuple
 from typing_extensions import TypedDict
 
 from langchain.tools.retriever import create_retriever_tool
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
 from pydantic import BaseModel, Field, field_validator
@@ -20,8 +23,17 @@ from langgraph.graph.message import add_messages
 from langgraph.graph import END, StateGraph, START
 
 import streamlit as st
-from utils.chunk_doc import get_retriever
+from utils.chunk_doc import (get_retriever, get_hybrid_retriever, get_cached_retriever, get_parent_retriever,
+                             get_chunk_mode, get_vector_store_stats, embedding_func)
+from utils.config import get_setting
 from utils.model import get_llm
+from utils.reranker import rerank_documents, DEFAULT_TOP_N as DEFAULT_RERANK_TOP_N
+from utils.context_packer import pack_context, DEFAULT_TOKEN_BUDGET
+from utils.faq_index import FAQIndex, DEFAULT_FAQ_PATH, DEFAULT_SIMILARITY_THRESHOLD as DEFAULT_FAQ_THRESHOLD
+from utils.response_cache import ResponseCache, context_hash
+from utils.language_detection import detect_language
+from utils.intent_classifier import (IntentClassifier, DEFAULT_CONFIDENCE_THRESHOLD as DEFAULT_INTENT_THRESHOLD,
+                                     DEFAULT_MIN_PRECISION as DEFAULT_INTENT_MIN_PRECISION)
 
 # Configure logging
 logging.basicConfig(
@@ -59,6 +71,32 @@ Return:
 1. message_type: 'dsa', 'pleasantry', or 'other'
 2. response: Appropriate response for non-DSA inputs"""
 
+# Language check and intent classification in a single call (INPUT_GATING=combined)
+INPUT_GATING_PROMPT = """Analyze the user's current input to a DSA (Data Structures and Algorithms) chatbot.
+
+Previous conversation:
+{context}
+
+Current input: {question}
+
+Step 1 - Language (judge ONLY the current input):
+- language: 'non_english' if ANY non-English content is present, 'english' if the input is entirely in English
+
+Step 2 - Intent (only meaningful for English input), ONE of:
+- dsa: Questions about data structures, algorithms, complexity analysis, implementation, problem-solving, or anything related to dsa
+- pleasantry: Greetings, thanks, goodbyes or conversational acknowledgments
+- other: Non-DSA questions or topics outside the scope of DSA
+
+Return:
+1. language: 'english' or 'non_english'
+2. message_type: 'dsa', 'pleasantry', or 'other'
+3. response: For non-English input: "I can only communicate in English. Please rephrase your question in English."
+   For pleasantries: respond naturally like a friendly tutor.
+   For other: tell the user it is out of your scope and redirect them to ask about DSA while being encouraging.
+   For dsa: an empty string"""
+
+INPUT_GATING_MODES = ("serial", "concurrent", "combined")
+
 # Consolidated Question Clarification Prompt
 QUESTION_CLARIFICATION_PROMPT = """
 You are a specialized DSA question processor working with a conversational AI system. Your task is to transform user questions into clear, context-aware queries while preserving the original intent.
@@ -264,6 +302,9 @@ You can use markdown formatting for better readability.
 
 """
 
+# Separator between retrieved chunks in the tool output
+DOCUMENT_SEPARATOR = "\n\n"
+
 # ===== Models and Type Definitions =====
 
 class MessageState(TypedDict):
@@ -271,6 +312,8 @@ class MessageState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]
     user_level: str
     retrieval_attempts: Optional[int] = 0
+    bypass_response_cache: Optional[bool] = False
+    question_id: Optional[str] = None  # id of the HumanMessage that opened the current turn
 
 # We're keeping this model to maintain backward compatibility with existing references
 class ValidationResult(BaseModel):
@@ -290,6 +333,19 @@ class ValidationResult(BaseModel):
         return v
 
 
+class InputGateResult(BaseModel):
+    """Model for the single-call language and intent check"""
+    language: Literal["english", "non_english"] = Field(
+        description="'non_english' if ANY non-English content is present, else 'english'"
+    )
+    message_type: Literal["dsa", "pleasantry", "other"] = Field(
+        description="Intent of the input: 'dsa', 'pleasantry' or 'other'"
+    )
+    response: str = Field(
+        description="Response for non-English or non-DSA inputs, empty for DSA questions"
+    )
+
+
 # ===== Utility Functions =====
 
 def format_conversation_context(messages: List[BaseMessage], max_messages: int = 10) -> str:
@@ -310,6 +366,169 @@ def format_conversation_context(messages: List[BaseMessage], max_messages: int =
     ])
 
 
+_workflow_retriever = None
+_workflow_retriever_lock = threading.Lock()
+
+
+def get_workflow_retriever():
+    """
+    Return the retriever used by the retrieval tool
+
+    RETRIEVER_MODE selects 'hybrid' (BM25 + dense with rank fusion, the default)
+    or 'dense' (vector search only). With CHUNK_MODE 'parent' the matched child
+    chunks are resolved to their parent sections. Unless RETRIEVAL_CACHE is 'off',
+    results are served through the semantic retrieval cache. The retriever is shared across
+    sessions so the cache is too.
+    """
+    global _workflow_retriever
+    with _workflow_retriever_lock:
+        if _workflow_retriever is None:
+            if str(get_setting("RETRIEVER_MODE", "hybrid")).lower() == "dense":
+                retriever = get_retriever()
+            else:
+                retriever = get_hybrid_retriever()
+            if get_chunk_mode() == "parent":
+                retriever = get_parent_retriever(retriever)
+            if str(get_setting("RETRIEVAL_CACHE", "on")).lower() != "off":
+                retriever = get_cached_retriever(retriever)
+            _workflow_retriever = retriever
+        return _workflow_retriever
+
+
+_faq_index = None
+_faq_index_lock = threading.Lock()
+
+
+def get_faq_index():
+    """
+    Return the shared FAQ answer index
+
+    FAQ_INDEX_PATH selects the index built by `python -m utils.faq_index`;
+    FAQ_SIMILARITY_THRESHOLD is the cosine similarity a question needs to
+    match a canonical one.
+    """
+    global _faq_index
+    with _faq_index_lock:
+        if _faq_index is None:
+            _faq_index = FAQIndex(
+                embedding_func,
+                path=get_setting("FAQ_INDEX_PATH", DEFAULT_FAQ_PATH),
+                similarity_threshold=float(get_setting("FAQ_SIMILARITY_THRESHOLD", DEFAULT_FAQ_THRESHOLD)),
+            )
+        return _faq_index
+
+
+_intent_classifier = None
+_intent_classifier_lock = threading.Lock()
+
+
+def get_intent_classifier():
+    """
+    Return the shared intent classifier, or None if INTENT_CLASSIFIER is 'llm'
+
+    INTENT_CONFIDENCE_THRESHOLD is the share of the kNN vote the winning
+    label needs before the LLM classification is skipped, and only labels
+    whose leave-one-out precision on the example bank reaches
+    INTENT_MIN_PRECISION are decided locally.
+    """
+    global _intent_classifier
+    if str(get_setting("INTENT_CLASSIFIER", "knn")).lower() == "llm":
+        return None
+    with _intent_classifier_lock:
+        if _intent_classifier is None:
+            _intent_classifier = IntentClassifier(
+                embedding_func,
+                confidence_threshold=float(get_setting("INTENT_CONFIDENCE_THRESHOLD", DEFAULT_INTENT_THRESHOLD)),
+                min_precision=float(get_setting("INTENT_MIN_PRECISION", DEFAULT_INTENT_MIN_PRECISION)),
+            )
+        return _intent_classifier
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    Return the shared response cache, or None if RESPONSE_CACHE is 'off'
+
+    RESPONSE_CACHE_THRESHOLD, RESPONSE_CACHE_SIZE and RESPONSE_CACHE_TTL tune
+    the question similarity threshold, the number of entries and their lifetime.
+    """
+    global _response_cache
+    if str(get_setting("RESPONSE_CACHE", "on")).lower() == "off":
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(
+                embedding_func,
+                similarity_threshold=float(get_setting("RESPONSE_CACHE_THRESHOLD", 0.95)),
+                max_entries=int(get_setting("RESPONSE_CACHE_SIZE", 1024)),
+                ttl=float(get_setting("RESPONSE_CACHE_TTL", 86400)),
+            )
+        return _response_cache
+
+
+def latest_human_index(messages) -> Optional[int]:
+    """Index of the latest HumanMessage (the question being answered), or None"""
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            return i
+    return None
+
+
+def turn_question_index(state) -> Optional[int]:
+    """
+    Index of the question that opened the current turn
+
+    classify_user_input records its id as question_id, and the clarifier
+    replaces it in place, so this is the clarified question; messages appended
+    later in the turn (tool calls, rewritten queries) come after it. Falls back
+    to the latest HumanMessage when the id isn't set.
+    """
+    messages = state["messages"]
+    question_id = state.get("question_id")
+    if question_id:
+        for i, message in enumerate(messages):
+            if message.id == question_id:
+                return i
+    return latest_human_index(messages)
+
+
+def response_cache_for(state):
+    """
+    Response cache to use for this turn, or None to bypass it
+
+    Answers to follow-ups are written against the previous exchanges, so the
+    cache is only used when no user or assistant message precedes the
+    question that opened this turn, and never when the caller sets
+    bypass_response_cache in the state.
+    """
+    if state.get("bypass_response_cache"):
+        return None
+    messages = state["messages"]
+    start = turn_question_index(state)
+    if start is None or any(isinstance(m, (HumanMessage, AIMessage)) for m in messages[:start]):
+        return None
+    return get_response_cache()
+
+
+def create_workflow_retriever_tool():
+    """
+    Create the retrieve_documents tool
+
+    The tool returns the Document objects as the ToolMessage artifact, so
+    post-retrieval steps (reranking) can work on individual chunks.
+    """
+    return create_retriever_tool(
+        get_workflow_retriever(),
+        "retrieve_documents",
+        """Search and return relevant documents based on user's query.""",
+        document_separator=DOCUMENT_SEPARATOR,
+        response_format="content_and_artifact",
+    )
+
+
 def get_message_content(message):
     """
     Safely extract text content from a message that might have different formats
@@ -356,10 +575,58 @@ def handle_workflow_error(e: Exception, messages, user_level, step_name="workflo
 
 # ===== Node Functions =====
 
-def check_language(question: str) -> ValidationResult:
+def use_local_language_detection() -> bool:
+    """LANGUAGE_DETECTION setting: 'local' (default) or 'llm'"""
+    return str(get_setting("LANGUAGE_DETECTION", "local")).lower() == "local"
+
+
+def detect_language_locally(question: str) -> Optional[ValidationResult]:
+    """
+    Decide the input language without an LLM call
+    
+    Args:
+        question: User's input text
+        
+    Returns:
+        ValidationResult, or None when the input is ambiguous
+    """
+    guess = detect_language(question)
+    if guess.label is None:
+        logger.info(f"Language ambiguous locally ({guess.reason}), asking the LLM")
+        return None
+    logger.info(f"Language detected locally: {guess.label} ({guess.reason})")
+    if guess.label == "non_english":
+        return ValidationResult(message_type="non_english",
+                                response="I can only communicate in English. Please rephrase your question in English.")
+    return ValidationResult(message_type="english", response="")
+
+
+def check_language(question: str, local: Optional[bool] = None) -> ValidationResult:
     """
     Check if the input is in English
     
+    Obvious cases are decided locally; ambiguous input goes to the LLM.
+    
+    Args:
+        question: User's input text
+        local: Try local detection first (default: LANGUAGE_DETECTION setting)
+        
+    Returns:
+        ValidationResult with language assessment
+    """
+    if local is None:
+        local = use_local_language_detection()
+    if local:
+        local_result = detect_language_locally(question)
+        if local_result is not None:
+            return local_result
+    return check_language_with_llm(question)
+
+
+def check_language_with_llm(question: str) -> ValidationResult:
+    """
+    Check if the input is in English with an LLM call
+    
     Args:
         question: User's input text
         
@@ -398,6 +665,9 @@ def check_content_type(context: str, question: str) -> ValidationResult:
     """
     Classify the content type of the input
     
+    Confidently classified inputs are labeled locally by the embedding kNN
+    classifier; the LLM classifies the rest.
+    
     Args:
         context: Conversation context
         question: User's input
@@ -405,6 +675,17 @@ def check_content_type(context: str, question: str) -> ValidationResult:
     Returns:
         ValidationResult with content classification
     """
+    classifier = get_intent_classifier()
+    if classifier is not None:
+        try:
+            local_result = classifier.classify(question, has_context=bool(context.strip()))
+            if local_result is not None:
+                message_type, response = local_result
+                return ValidationResult(message_type=message_type, response=response)
+        except Exception as e:
+            # The local classifier is only a shortcut; fall back to the LLM
+            logger.warning(f"Local intent classification failed: {e}")
+    
     llm = get_llm(temperature=0.5)
     classification_prompt = PromptTemplate(
         template=CONTENT_CLASSIFICATION_PROMPT,
@@ -414,6 +695,96 @@ def check_content_type(context: str, question: str) -> ValidationResult:
     return chain.invoke({"context": context, "question": question})
 
 
+def check_input_combined(context: str, question: str) -> InputGateResult:
+    """
+    Check language and classify intent with one structured LLM call
+    
+    Args:
+        context: Conversation context
+        question: User's input
+        
+    Returns:
+        InputGateResult with language, intent and response
+    """
+    llm = get_llm(temperature=0.5)
+    gating_prompt = PromptTemplate(
+        template=INPUT_GATING_PROMPT,
+        input_variables=["context", "question"]
+    )
+    chain = gating_prompt | llm.with_structured_output(InputGateResult)
+    return chain.invoke({"context": context, "question": question})
+
+
+_gating_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="input-gating")
+
+
+def get_input_gating_mode() -> str:
+    """INPUT_GATING setting: 'serial', 'concurrent' (default) or 'combined'"""
+    mode = str(get_setting("INPUT_GATING", "concurrent")).lower()
+    if mode not in INPUT_GATING_MODES:
+        logger.warning(f"Unknown INPUT_GATING '{mode}', using 'concurrent'")
+        return "concurrent"
+    return mode
+
+
+def gate_input(messages, mode: Optional[str] = None,
+               local_language: Optional[bool] = None) -> Tuple[ValidationResult, Optional[ValidationResult]]:
+    """
+    Run the language check and intent classification for the latest message
+    
+    serial: language check, then classification (two round-trips)
+    concurrent: both calls in flight at once (one round-trip of latency)
+    combined: a single structured call producing both
+    
+    With local language detection on, input whose language is clear locally
+    skips the language call in every mode.
+    
+    Args:
+        messages: Current message list
+        mode: Gating mode (default: INPUT_GATING setting)
+        local_language: Try local language detection first (default:
+            LANGUAGE_DETECTION setting)
+        
+    Returns:
+        (language result, content result); the content result is None for
+        non-English input
+    """
+    mode = mode or get_input_gating_mode()
+    if local_language is None:
+        local_language = use_local_language_detection()
+    question = get_message_content(messages[-1])
+    
+    if mode == "serial":
+        language_result = check_language(question, local_language)
+        if language_result.message_type == "non_english":
+            return language_result, None
+        return language_result, check_content_type(format_conversation_context(messages), question)
+    
+    # When the language is clear locally, only the classification call is left
+    language_result = detect_language_locally(question) if local_language else None
+    if language_result is not None:
+        if language_result.message_type == "non_english":
+            return language_result, None
+        return language_result, check_content_type(format_conversation_context(messages), question)
+    
+    if mode == "combined":
+        result = check_input_combined(format_conversation_context(messages), question)
+        if result.language == "non_english":
+            return ValidationResult(message_type="non_english", response=result.response), None
+        return (ValidationResult(message_type="english", response=""),
+                ValidationResult(message_type=result.message_type, response=result.response))
+    
+    if mode == "concurrent":
+        content_future = _gating_executor.submit(check_content_type, format_conversation_context(messages), question)
+        language_result = check_language_with_llm(question)
+        if language_result.message_type == "non_english":
+            content_future.cancel()
+            return language_result, None
+        return language_result, content_future.result()
+    
+    raise ValueError(f"Unknown input gating mode: {mode}")
+
+
 def proceed_with_dsa_query(messages, user_level):
     """
     Proceed with DSA-related query
@@ -453,6 +824,42 @@ def redirect_non_dsa_query(messages, user_level, response):
     }
 
 
+def answer_from_faq(state: MessageState) -> Dict[str, Any]:
+    """
+    Answer canonical questions straight from the FAQ index, before classification.
+    
+    Args:
+        state: Current state containing messages and user level
+        
+    Returns:
+        Updated state with the stored answer, or unchanged state to classify
+    """
+    messages = state["messages"]
+    user_level = state["user_level"]
+    
+    try:
+        question = get_message_content(messages[-1])
+        start = time.perf_counter()
+        match = get_faq_index().lookup(question, user_level)
+        if match is not None:
+            answer, similarity = match
+            logger.info(f"FAQ hit (similarity {similarity:.3f}) in {(time.perf_counter() - start) * 1000:.1f} ms")
+            return {
+                "messages": [*messages, AIMessage(content=answer)],
+                "user_level": user_level,
+                "next": "answered"
+            }
+    except Exception as e:
+        # The FAQ is only a shortcut; fall through to the full workflow
+        logger.warning(f"FAQ lookup failed: {e}")
+    
+    return {
+        "messages": messages,
+        "user_level": user_level,
+        "next": "classify"
+    }
+
+
 def classify_user_input(state: MessageState) -> Dict[str, Any]:
     """
     Classify user input as DSA-related, pleasantry, non-English, or other.
@@ -466,29 +873,22 @@ def classify_user_input(state: MessageState) -> Dict[str, Any]:
     logger.info("Classifying user input")
     messages = state["messages"]
     user_level = state["user_level"]
+    # The question that opens this turn (see turn_question_index)
+    turn = {"question_id": messages[-1].id if messages else None}
     
     try:
-        # Get user's question from the latest message
-        question = get_message_content(messages[-1])
-        
-        # Check if current message is in English
-        language_result = check_language(question)
+        # Check the language and classify English input (see INPUT_GATING)
+        language_result, content_result = gate_input(messages)
         if language_result.message_type == "non_english":
-            return handle_non_english_input(messages, user_level)
-        
-        # Get conversation context
-        conversation_context = format_conversation_context(messages)
-        
-        # Classify English input
-        content_result = check_content_type(conversation_context, question)
+            return {**handle_non_english_input(messages, user_level), **turn}
         
         if content_result.message_type == "dsa":
-            return proceed_with_dsa_query(messages, user_level)
+            return {**proceed_with_dsa_query(messages, user_level), **turn}
         else:
-            return redirect_non_dsa_query(messages, user_level, content_result.response)
+            return {**redirect_non_dsa_query(messages, user_level, content_result.response), **turn}
             
     except Exception as e:
-        return handle_workflow_error(e, messages, user_level, "classify_user_input", "proceed")
+        return {**handle_workflow_error(e, messages, user_level, "classify_user_input", "proceed"), **turn}
 
 
 def expand_ambiguous_question(state: MessageState) -> Dict[str, Any]:
@@ -540,8 +940,9 @@ def expand_ambiguous_question(state: MessageState) -> Dict[str, Any]:
         # If the clarified question is different from the original, use it
         if clarified_question and clarified_question != current_question:
             logger.info(f"Question processed: '{current_question}' -> '{clarified_question}'")
+            # Same id, so add_messages replaces the question instead of appending
             return {
-                "messages": [*messages[:-1], HumanMessage(content=clarified_question)], 
+                "messages": [*messages[:-1], HumanMessage(content=clarified_question, id=messages[-1].id)], 
                 "user_level": user_level,
                 "retrieval_attempts": 0  # Reset retrieval attempts
             }
@@ -597,12 +998,7 @@ def evaluate_and_retrieve(state: MessageState) -> Dict[str, Any]:
         ]
         
         # Initialize model with tools
-        retriever = get_retriever()
-        retriever_tool = create_retriever_tool(
-            retriever,
-            "retrieve_documents",
-            """Search and return relevant documents based on user's query."""
-        )
+        retriever_tool = create_workflow_retriever_tool()
         
         tools = [retriever_tool]
         llm = get_llm().bind_tools(tools)
@@ -736,6 +1132,115 @@ def optimize_query(state: MessageState) -> Dict[str, Any]:
         return handle_workflow_error(e, messages, state["user_level"], "optimize_query")
 
 
+def get_retrieval_query(messages) -> str:
+    """
+    Return the query the retrieval tool was called with, falling back to the
+    latest human message
+    """
+    for message in reversed(messages):
+        if isinstance(message, AIMessage) and getattr(message, "tool_calls", None):
+            query = message.tool_calls[0].get("args", {}).get("query")
+            if query:
+                return query
+            break
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return get_message_content(message)
+    return ""
+
+
+def rerank_retrieved_documents(state: MessageState) -> Dict[str, Any]:
+    """
+    Keep only the most relevant retrieved chunks using a local cross-encoder.
+
+    Controlled by RERANK_TOP_N (0 disables reranking).
+    
+    Args:
+        state: Current state whose last message is the retrieval ToolMessage
+        
+    Returns:
+        State update replacing the ToolMessage with the reranked chunks
+    """
+    messages = state["messages"]
+    top_n = int(get_setting("RERANK_TOP_N", DEFAULT_RERANK_TOP_N))
+    # First node after the retrieve tool: log the shared store's connect time and query latency
+    logger.info(f"Vector store stats: {get_vector_store_stats()}")
+    
+    try:
+        tool_message = messages[-1] if messages else None
+        documents = getattr(tool_message, "artifact", None)
+        if top_n <= 0 or not isinstance(tool_message, ToolMessage) or not documents or len(documents) <= top_n:
+            return {}
+        
+        query = get_retrieval_query(messages)
+        start = time.perf_counter()
+        ranked = rerank_documents(query, documents, top_n=top_n)
+        kept = [document for document, _ in ranked]
+        content = DOCUMENT_SEPARATOR.join(document.page_content for document in kept)
+        logger.info(f"Reranked {len(documents)} -> {len(kept)} chunks "
+                    f"({len(tool_message.content)} -> {len(content)} chars) in {(time.perf_counter() - start) * 1000:.0f} ms")
+        
+        # Same id, so add_messages replaces the original tool output
+        return {
+            "messages": [ToolMessage(
+                content=content,
+                artifact=kept,
+                tool_call_id=tool_message.tool_call_id,
+                name=tool_message.name,
+                id=tool_message.id,
+            )]
+        }
+        
+    except Exception as e:
+        logger.error(f"Error in rerank_retrieved_documents: {str(e)}", exc_info=True)
+        # On error keep the original retrieval results
+        return {}
+
+
+def pack_retrieved_context(state: MessageState) -> Dict[str, Any]:
+    """
+    Merge overlapping chunks and fit the retrieved context into a token budget.
+
+    Controlled by CONTEXT_TOKEN_BUDGET (0 disables packing).
+    
+    Args:
+        state: Current state whose last message is the retrieval ToolMessage
+        
+    Returns:
+        State update replacing the ToolMessage with the packed context
+    """
+    messages = state["messages"]
+    token_budget = int(get_setting("CONTEXT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
+    
+    try:
+        tool_message = messages[-1] if messages else None
+        documents = getattr(tool_message, "artifact", None)
+        if token_budget <= 0 or not isinstance(tool_message, ToolMessage) or not documents:
+            return {}
+        
+        packed = pack_context(documents, token_budget=token_budget, separator=DOCUMENT_SEPARATOR)
+        if not packed:
+            return {}
+        content = DOCUMENT_SEPARATOR.join(document.page_content for document in packed)
+        logger.info(f"Packed {len(documents)} chunks into {len(packed)} passages "
+                    f"({len(tool_message.content)} -> {len(content)} chars)")
+        
+        return {
+            "messages": [ToolMessage(
+                content=content,
+                artifact=packed,
+                tool_call_id=tool_message.tool_call_id,
+                name=tool_message.name,
+                id=tool_message.id,
+            )]
+        }
+        
+    except Exception as e:
+        logger.error(f"Error in pack_retrieved_context: {str(e)}", exc_info=True)
+        # On error keep the original retrieval results
+        return {}
+
+
 def get_level_requirements(user_level: str) -> str:
     """
     Get improved content requirements specific to user level.
@@ -802,8 +1307,9 @@ def synthesize_response(state: MessageState) -> Dict[str, Any]:
                 "user_level": user_level
             }
             
-        # Get the current question
-        question = get_message_content(messages[-2])
+        # Get the current (clarified) question; messages[-2] is the tool call, which has no content
+        start = turn_question_index(state)
+        question = get_message_content(messages[start]) if start is not None else ""
         docs = get_message_content(messages[-1])
         
         if not docs or len(docs.strip()) < 10:
@@ -824,6 +1330,18 @@ def synthesize_response(state: MessageState) -> Dict[str, Any]:
                 
         conversation_history = "\n\n---\n\n".join(previous_responses)
             
+        # Serve identical or near-identical questions over the same context from the cache
+        response_cache = response_cache_for(state)
+        docs_key = context_hash(docs)
+        if response_cache is not None:
+            cached_response = response_cache.get(question, user_level, docs_key)
+            if cached_response is not None:
+                logger.info(f"Response cache hit for user level: {user_level}")
+                return {
+                    "messages": [AIMessage(content=cached_response)], 
+                    "user_level": user_level
+                }
+            
         # Level-specific content requirements
         level_requirements = get_level_requirements(user_level)
         
@@ -845,6 +1363,8 @@ def synthesize_response(state: MessageState) -> Dict[str, Any]:
         })
         
         logger.info(f"Generated response for user level: {user_level}")
+        if response_cache is not None:
+            response_cache.put(question, user_level, docs_key, response)
         
         return {
             "messages": [AIMessage(content=response)], 
@@ -901,6 +1421,20 @@ def generate_direct_response(state: MessageState) -> Dict[str, Any]:
                 
         conversation_history = "\n\n---\n\n".join(previous_responses)
             
+        # Serve identical or near-identical questions from the cache, keyed on the
+        # clarified question rather than a rewritten retrieval query
+        response_cache = response_cache_for(state)
+        start = turn_question_index(state)
+        cache_question = get_message_content(messages[start]) if start is not None else question
+        if response_cache is not None:
+            cached_response = response_cache.get(cache_question, user_level, context_hash(None))
+            if cached_response is not None:
+                logger.info(f"Response cache hit (direct) for user level: {user_level}")
+                return {
+                    "messages": [AIMessage(content=cached_response)], 
+                    "user_level": user_level
+                }
+            
         # Level-specific content requirements
         level_requirements = get_level_requirements(user_level)
         
@@ -921,6 +1455,8 @@ def generate_direct_response(state: MessageState) -> Dict[str, Any]:
         })
         
         logger.info(f"Generated direct response for user level: {user_level}")
+        if response_cache is not None:
+            response_cache.put(cache_question, user_level, context_hash(None), response)
         
         from langchain_core.messages import RemoveMessage
         
@@ -933,37 +1469,52 @@ def generate_direct_response(state: MessageState) -> Dict[str, Any]:
         return handle_workflow_error(e, messages, user_level, "generate_direct_response")
 # ===== Graph Setup =====
 
-def create_retrieval_graph() -> StateGraph:
+def create_retrieval_graph(use_faq: bool = True) -> StateGraph:
     """
     Create and configure the retrieval workflow graph.
     
+    Args:
+        use_faq: Consult the FAQ index first (unless FAQ_INDEX is 'off')
+    
     Returns:
         Configured StateGraph ready for compilation
     """
     logger.info("Setting up retrieval workflow graph")
     
     # Initialize retriever for the tool node
-    retriever = get_retriever()
-    retriever_tool = create_retriever_tool(
-        retriever,
-        "retrieve_documents",
-        """Search and return relevant documents based on user's query."""
-    )
+    retriever_tool = create_workflow_retriever_tool()
     
     # Create state graph with schema
     workflow = StateGraph(MessageState)
     
+    use_faq = use_faq and str(get_setting("FAQ_INDEX", "on")).lower() != "off"
+    
     # Add nodes
+    if use_faq:
+        workflow.add_node("answer_from_faq", answer_from_faq)
     workflow.add_node("classify_user_input", classify_user_input)
     workflow.add_node("expand_ambiguous_question", expand_ambiguous_question)
     workflow.add_node("evaluate_and_retrieve", evaluate_and_retrieve)
     workflow.add_node("retrieve", ToolNode([retriever_tool]))
+    workflow.add_node("rerank_retrieved_documents", rerank_retrieved_documents)
+    workflow.add_node("pack_retrieved_context", pack_retrieved_context)
     workflow.add_node("synthesize_response", synthesize_response)  # For retrieval-based responses
     workflow.add_node("generate_direct_response", generate_direct_response)  # For direct knowledge responses
     workflow.add_node("optimize_query", optimize_query)
     
     # Add edges
-    workflow.add_edge(START, "classify_user_input")
+    if use_faq:
+        workflow.add_edge(START, "answer_from_faq")
+        workflow.add_conditional_edges(
+            "answer_from_faq",
+            lambda x: x.get("next", "classify"),
+            {
+                "answered": END,
+                "classify": "classify_user_input"
+            }
+        )
+    else:
+        workflow.add_edge(START, "classify_user_input")
     
     # Conditional edges from classification
     workflow.add_conditional_edges(
@@ -997,9 +1548,11 @@ def create_retrieval_graph() -> StateGraph:
             }
     )
     
-    # Document relevance assessment
+    # Rerank and pack retrieved chunks, then assess document relevance
+    workflow.add_edge("retrieve", "rerank_retrieved_documents")
+    workflow.add_edge("rerank_retrieved_documents", "pack_retrieved_context")
     workflow.add_conditional_edges(
-        "retrieve",
+        "pack_retrieved_context",
         assess_document_relevance,
         {
             "generate": "synthesize_response",
@@ -102,19 +102,193 @@ def get_sentence_chunks(text, tokenizer, min_chunk_size=150, max_chunk_size=250,
         print(f"An error occurred: {e}")
         return []
 
+###
+### Offset-based chunking with a fast tokenizer
+###
+# The chunkers above slice Python token lists and call tokenizer.decode for
+# every chunk (and get_sentence_chunks encodes each sentence on its own).
+# These variants tokenize whole texts in one batched call, keep token ids and
+# character offsets in numpy arrays, and cut chunks straight out of the
+# original text using the offsets, so nothing is decoded. Chunk text is
+# therefore the exact source text (original casing and whitespace).
+
+import numpy as np
+
+def encode_with_offsets(texts, tokenizer):
+    """
+    Batch-tokenize texts with a fast (Rust) tokenizer
+
+    Args:
+        texts: List of strings
+        tokenizer: transformers fast tokenizer (tokenizer.is_fast)
+
+    Returns:
+        List of (token ids as uint32 array, character offsets as int32 array of shape (n, 2))
+    """
+    if not getattr(tokenizer, "is_fast", False):
+        raise ValueError("Offset-based chunking needs a fast tokenizer (AutoTokenizer with use_fast=True)")
+    encodings = tokenizer(
+        texts,
+        add_special_tokens=False,
+        return_offsets_mapping=True,
+        return_attention_mask=False,
+        return_token_type_ids=False,
+        truncation=False,
+        verbose=False,
+    )
+    return [
+        (np.asarray(ids, dtype=np.uint32), np.asarray(offsets, dtype=np.int32).reshape(-1, 2))
+        for ids, offsets in zip(encodings["input_ids"], encodings["offset_mapping"])
+    ]
+
+def _slice_by_tokens(text, offsets, start, end):
+    """Text covered by tokens [start, end)"""
+    return text[offsets[start, 0]:offsets[end - 1, 1]]
+
+def get_cst_token_chunks_fast(texts, tokenizer, chunk_size=250, chunk_overlap=50, return_token_ids=False):
+    """
+    Offset-based equivalent of get_cst_token_chunks for a batch of texts
+
+    Args:
+        texts: List of strings
+        tokenizer: transformers fast tokenizer
+        chunk_size: Tokens per chunk
+        chunk_overlap: Tokens shared by consecutive chunks
+        return_token_ids: Also return each chunk's token ids (uint32 array views)
+
+    Returns:
+        One list of chunk strings per text, or of (chunk string, token ids) pairs
+    """
+    if chunk_overlap >= chunk_size:
+        raise ValueError("chunk_overlap must be smaller than chunk_size")
+    results = []
+    for text, (ids, offsets) in zip(texts, encode_with_offsets(texts, tokenizer)):
+        chunks = []
+        for start in range(0, len(ids), chunk_size - chunk_overlap):
+            end = min(start + chunk_size, len(ids))
+            chunk = _slice_by_tokens(text, offsets, start, end)
+            chunks.append((chunk, ids[start:end]) if return_token_ids else chunk)
+            # Break if the end of the tokens is reached
+            if end >= len(ids):
+                break
+        results.append(chunks)
+    return results
+
+def _sentence_token_ranges(text, offsets):
+    """Map nltk sentences to [start, end) token ranges of the whole-text tokenization"""
+    token_starts = offsets[:, 0]
+    ranges = []
+    position = 0
+    for sentence in nltk.sent_tokenize(text):
+        sentence_start = text.find(sentence, position)
+        if sentence_start < 0:
+            continue
+        position = sentence_start + len(sentence)
+        start = int(np.searchsorted(token_starts, sentence_start, side="left"))
+        end = int(np.searchsorted(token_starts, position, side="left"))
+        if end > start:
+            ranges.append((start, end))
+    return ranges
+
+def get_sentence_chunks_fast(texts, tokenizer, min_chunk_size=150, max_chunk_size=250, overlap_size=50,
+                             return_token_ids=False):
+    """
+    Offset-based equivalent of get_sentence_chunks for a batch of texts
+
+    Each text is tokenized once; sentences are mapped onto token ranges, so
+    no sentence is encoded separately. Chunks are contiguous spans of the
+    original text: a chunk still being filled is emitted before an
+    over-long sentence is split, instead of continuing around it.
+
+    Args:
+        texts: List of strings
+        tokenizer: transformers fast tokenizer
+        min_chunk_size: Minimum tokens for the final chunk of a text
+        max_chunk_size: Maximum tokens per chunk
+        overlap_size: Tokens carried over from the previous chunk
+        return_token_ids: Also return each chunk's token ids (uint32 array views)
+
+    Returns:
+        One list of chunk strings per text, or of (chunk string, token ids) pairs
+    """
+    results = []
+    for text, (ids, offsets) in zip(texts, encode_with_offsets(texts, tokenizer)):
+        chunks = []
+
+        def emit(start, end):
+            chunk = _slice_by_tokens(text, offsets, start, end)
+            chunks.append((chunk, ids[start:end]) if return_token_ids else chunk)
+
+        chunk_start = chunk_end = 0  # current chunk is tokens [chunk_start, chunk_end)
+        for sentence_start, sentence_end in _sentence_token_ranges(text, offsets):
+            sentence_length = sentence_end - sentence_start
+
+            # If the sentence is longer than max_chunk_size, split it
+            if sentence_length > max_chunk_size:
+                if chunk_end > chunk_start:
+                    emit(chunk_start, chunk_end)
+                for start in range(sentence_start, sentence_end, max_chunk_size):
+                    emit(start, min(start + max_chunk_size, sentence_end))
+                chunk_start = chunk_end = sentence_end
+                continue
+
+            if chunk_end == chunk_start:
+                chunk_start = chunk_end = sentence_start
+            # Check if the current chunk will exceed max_chunk_size
+            elif (chunk_end - chunk_start) + sentence_length > max_chunk_size:
+                emit(chunk_start, chunk_end)
+                # Start a new chunk with overlap if necessary
+                chunk_start = max(chunk_start, chunk_end - overlap_size) if overlap_size > 0 else sentence_start
+            chunk_end = sentence_end
+
+        # Add any remaining tokens as the last chunk
+        if chunk_end - chunk_start >= min_chunk_size:
+            emit(chunk_start, chunk_end)
+        results.append(chunks)
+    return results
+
 ###
 ### Append chunks to the vector store
 ###
 
+import logging
 from pathlib import Path
-from utils.custom_embeddings import MyEmbeddings
+from utils.custom_embeddings import embedding_func as base_embedding_func
+from utils.embedding_cache import (CachedEmbeddings, QueryEmbeddingLRU, DEFAULT_QUERY_CACHE_SIZE,
+                                   DEFAULT_QUERY_CACHE_TTL)
+from utils.embedding_pool import ParallelEmbeddings
+from utils.config import get_setting
 from langchain_text_splitters import RecursiveCharacterTextSplitter as Rec
 import streamlit as st
 from langchain_core.documents import Document
 from langchain_milvus import Zilliz
+from utils.local_vector_store import LocalVectorStore, DEFAULT_INDEX_PATH
+from utils.hybrid_retriever import BM25Index, HybridRetriever, DEFAULT_BM25_PATH
+from utils.ingestion_manifest import IngestionManifest, DEFAULT_MANIFEST_PATH
+from utils.ingestion_pipeline import run_ingestion, DEFAULT_BATCH_SIZE as DEFAULT_INGEST_BATCH_SIZE
+from utils.retrieval_cache import CachedRetriever
+from utils.dedup import DEFAULT_MAX_DISTANCE as DEFAULT_DEDUP_MAX_DISTANCE
+from utils.vector_store_client import SharedVectorStore, LazyVectorStoreRetriever
+from utils.parent_documents import (ParentStore, ParentDocumentRetriever, split_sections, split_children,
+                                    DEFAULT_PARENT_STORE_PATH, DEFAULT_MAX_PARENTS)
+from functools import partial
+from contextlib import contextmanager
 
-# Initialize Embedding Model
-embedding_func = MyEmbeddings()
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Initialize Embedding Model, backed by the persistent embedding cache
+embedding_func = CachedEmbeddings(
+    base_embedding_func,
+    query_cache=QueryEmbeddingLRU(
+        max_size=int(get_setting("QUERY_EMBEDDING_CACHE_SIZE", DEFAULT_QUERY_CACHE_SIZE)),
+        ttl=float(get_setting("QUERY_EMBEDDING_CACHE_TTL", DEFAULT_QUERY_CACHE_TTL)),
+    ),
+)
 
 
 
@@ -136,83 +310,290 @@ embedding_func = MyEmbeddings()
 #     namespace=st.secrets["ASTRA_DB_NAMESPACE"],
 # )
 
-vector_store = Zilliz(
-    collection_name="dsa_data",
-    embedding_function=embedding_func,
-    connection_args={
-        "uri": st.secrets["ZILLIZ_CLOUD_URI"],
-        "user": st.secrets["ZILLIZ_CLOUD_USERNAME"],
-        "password": st.secrets["ZILLIZ_CLOUD_PASSWORD"],
-        "token": st.secrets["ZILLIZ_CLOUD_API_KEY"],  # API key, for serverless clusters which can be used as replacements for user and password
-        "secure": True,
-    },
-    auto_id=True,
-    index_params={"metric_type": "COSINE", "index_type": "FLAT"},
-)
+VECTOR_STORE_BACKENDS = ("zilliz", "local")
+
+def create_vector_store(backend=None):
+    """
+    Build the vector store selected by the VECTOR_STORE_BACKEND setting
+
+    Args:
+        backend: 'zilliz' (default) or 'local' to override the setting
+    """
+    backend = (backend or get_setting("VECTOR_STORE_BACKEND", "zilliz")).lower()
 
- 
-def split_chunks():
+    if backend == "local":
+        return LocalVectorStore(
+            embedding_function=embedding_func,
+            index_path=get_setting("LOCAL_INDEX_PATH", DEFAULT_INDEX_PATH),
+        )
+
+    if backend == "zilliz":
+        return Zilliz(
+            collection_name="dsa_data",
+            embedding_function=embedding_func,
+            connection_args={
+                "uri": st.secrets["ZILLIZ_CLOUD_URI"],
+                "user": st.secrets["ZILLIZ_CLOUD_USERNAME"],
+                "password": st.secrets["ZILLIZ_CLOUD_PASSWORD"],
+                "token": st.secrets["ZILLIZ_CLOUD_API_KEY"],  # API key, for serverless clusters which can be used as replacements for user and password
+                "secure": True,
+            },
+            auto_id=True,
+            index_params={"metric_type": "COSINE", "index_type": "FLAT"},
+        )
+
+    raise ValueError(f"VECTOR_STORE_BACKEND must be one of {VECTOR_STORE_BACKENDS}, got '{backend}'")
+
+# One vector store (and Milvus connection) per process, shared by all sessions.
+# It connects on the first search, so importing this module or building the
+# workflow graphs doesn't wait on the cloud cluster.
+shared_vector_store = SharedVectorStore(create_vector_store)
+
+
+def get_text_splitter():
+    ## Chunk Method 3: Recursive Character Chunking
+    return Rec(
+        chunk_size=2000,
+        chunk_overlap=500,
+        length_function=len,
+        add_start_index=True
+    )
+
+def chunk_markdown(md_file, md_content):
+    """
+    Split one markdown file into chunk Documents
+
+    Args:
+        md_file: Path of the markdown file, stored as the chunk source
+        md_content: Text of the file
+
+    Returns:
+        List of Documents
+    """
+    # Chunk the markdown content
+    ## Chunk Method 1: Sentence Chunking
+    # chunks = get_sentence_chunks(md_content, tokenizer)
+    
+    ## Chunk Method 2: CST Token Chunking
+    # chunks = get_cst_token_chunks(md_content, tokenizer)
+    
+    ## Chunk Method 3: Recursive Character Chunking
+    text_splitter = get_text_splitter()
+    # Create a Document object for each chunk; add_start_index records each
+    # chunk's character offset so overlapping chunks can be merged later
+    return text_splitter.create_documents([md_content], metadatas=[{"source": str(md_file)}])
+
+def chunk_pdf_pages(pdf_file):
+    """
+    Convert and split a PDF page by page, yielding chunk Documents as it goes
+
+    Chunks never span pages and carry their 1-based page number in the
+    "page" metadata. start_index is the offset in the concatenated page
+    texts, so chunks of neighbouring pages can still be merged in order.
+
+    Args:
+        pdf_file: Path of the PDF, stored as the chunk source
+
+    Yields:
+        Documents
+    """
+    # Imported here so retrieval doesn't load pymupdf at startup
+    from utils.convert_to_md import iter_pdf_pages
+
+    text_splitter = get_text_splitter()
+    offset = 0
+    for page_number, page_text in iter_pdf_pages(pdf_file):
+        for document in text_splitter.create_documents(
+            [page_text], metadatas=[{"source": str(pdf_file), "page": page_number}]
+        ):
+            document.metadata["start_index"] += offset
+            yield document
+        offset += len(page_text)
+
+CHUNK_MODES = ("flat", "parent")
+
+def get_chunk_mode():
+    """CHUNK_MODE setting: 'flat' (2000-character chunks, default) or 'parent' (parent-document retrieval)"""
+    mode = str(get_setting("CHUNK_MODE", "flat")).lower()
+    if mode not in CHUNK_MODES:
+        raise ValueError(f"CHUNK_MODE must be one of {CHUNK_MODES}, got '{mode}'")
+    return mode
+
+def get_parent_store():
+    return ParentStore(get_setting("PARENT_STORE_PATH", DEFAULT_PARENT_STORE_PATH))
+
+def chunk_markdown_sections(md_file, md_content, parent_store):
+    """
+    Split one markdown file for parent-document retrieval
+
+    The file is split into parent sections at its headings, which are saved to
+    the parent store; the returned small child chunks are what gets embedded.
+
+    Args:
+        md_file: Path of the markdown file, stored as the chunk source
+        md_content: Text of the file
+        parent_store: ParentStore receiving the file's sections
+
+    Returns:
+        List of child Documents with a parent_id in their metadata
+    """
+    parents = split_sections(md_content, str(md_file))
+    parent_store.replace_source(str(md_file), parents)
+    return split_children(parents)
+
+def get_dedup_max_distance():
+    """SimHash distance for near-duplicate filtering, or None if INGEST_DEDUP is 'off'"""
+    if str(get_setting("INGEST_DEDUP", "on")).lower() == "off":
+        return None
+    return int(get_setting("INGEST_DEDUP_MAX_DISTANCE", DEFAULT_DEDUP_MAX_DISTANCE))
+
+@contextmanager
+def ingestion_embeddings(workers=None, batch_size=DEFAULT_INGEST_BATCH_SIZE):
+    """
+    Embeddings for ingestion: cached, and sharded across processes if workers > 1
+
+    Yields:
+        Embeddings object with an encode(texts) -> float32 array method
+    """
+    workers = int(workers or get_setting("INGEST_WORKERS", 1))
+    if workers <= 1:
+        yield embedding_func
+        return
+    with ParallelEmbeddings(workers=workers, shard_size=max(32, batch_size // workers)) as parallel_embeddings:
+        yield CachedEmbeddings(parallel_embeddings)
+
+def split_chunks(workers=None, batch_size=None, from_pdf=False):
+    """
+    Incrementally sync data/md/ (or, with from_pdf, data/books/) into the vector store
+
+    Files whose hash matches the ingestion manifest are skipped. For changed
+    files only new chunks are embedded and written, chunks that no longer
+    exist are deleted, and files removed from data/md/ have all their chunks
+    deleted. Running it on an unchanged corpus is a no-op.
+
+    Chunks that are near-duplicates (SimHash) of chunks already in the
+    collection are dropped before embedding unless INGEST_DEDUP is 'off'.
+
+    Ingestion streams read -> split -> embed -> write in bounded batches and
+    checkpoints the manifest after every file, so an interrupted run resumes
+    with the file it was working on (re-embedding it mostly from the
+    embedding cache).
+
+    With CHUNK_MODE 'parent', files are split into heading sections (kept in
+    the parent store) and small child chunks, and only the children are
+    embedded. Switching CHUNK_MODE needs a fresh collection and manifest.
+
+    With from_pdf, PDFs are converted page by page and each page is split
+    and embedded as soon as it is converted, so no book is ever held in
+    memory as one markdown string. Chunks keep their page number in the
+    "page" metadata.
+
+    Note: the manifest only knows about chunks written through it, so point
+    the first manifest-driven run at an empty collection.
+
+    Args:
+        workers: Number of embedding processes (default: INGEST_WORKERS setting, 1 = in-process)
+        batch_size: Chunks per embed/write batch (default: INGEST_BATCH_SIZE setting)
+        from_pdf: Stream data/books/*.pdf instead of reading data/md/*.md
+    """
     try:
         # Path to markdown directory
-        md_dir = Path("data/md/")
+        md_dir = Path("data/books/") if from_pdf else Path("data/md/")
         # md_dir = Path("scraped_content/")
-        chunk_id_counter = 1  # Initialize a counter for unique chunk IDs
-        ids = []
-        documents = []
-
-        # Loop through all markdown files in the md directory
-        for md_file in md_dir.glob("*.md"):
-            with open(md_file, "r") as f:
-                md_content = f.read()
-
-            # Chunk the markdown content
-            ## Chunk Method 1: Sentence Chunking
-            # chunks = get_sentence_chunks(md_content, tokenizer)
-            
-            ## Chunk Method 2: CST Token Chunking
-            # chunks = get_cst_token_chunks(md_content, tokenizer)
-            
-            ## Chunk Method 3: Recursive Character Chunking
-            text_splitter = Rec(
-                chunk_size=2000,
-                chunk_overlap=500,
-                length_function=len,
-                add_start_index=True
+        batch_size = int(batch_size or get_setting("INGEST_BATCH_SIZE", DEFAULT_INGEST_BATCH_SIZE))
+        manifest = IngestionManifest(get_setting("INGEST_MANIFEST_PATH", DEFAULT_MANIFEST_PATH))
+        parent_store = get_parent_store() if get_chunk_mode() == "parent" else None
+        if parent_store is not None and from_pdf:
+            logger.warning("CHUNK_MODE 'parent' needs the markdown headings; ingesting PDF pages as flat chunks")
+            parent_store = None
+        chunker = partial(chunk_markdown_sections, parent_store=parent_store) if parent_store else chunk_markdown
+
+        with ingestion_embeddings(workers, batch_size) as embeddings:
+            run_ingestion(
+                md_dir,
+                store = get_vector_store(),
+                encode = embeddings.encode,
+                chunker = chunker,
+                manifest = manifest,
+                bm25_path = get_setting("BM25_INDEX_PATH", DEFAULT_BM25_PATH),
+                batch_size = batch_size,
+                dedup_max_distance = get_dedup_max_distance(),
+                pattern = "*.pdf" if from_pdf else "*.md",
+                file_chunker = chunk_pdf_pages if from_pdf else None,
             )
-            chunks = text_splitter.split_text(md_content)
-            
-            for chunk in chunks:
-                # Create a Document object for the chunk
-                document_to_add = Document(
-                    page_content = chunk,
-                    metadata = {"source": str(md_file)}
-                )
-                
-                documents.append(document_to_add)
-                
-                # ids.append(str(chunk_id_counter)) # Add document ID to the list
-
-                # chunk_id_counter += 1  # Increment the ID counter
-        
-        vector_store.add_documents(documents = documents)
-        # vector_store.add_documents(documents = documents, ids = ids)
+            # Counters of the instance that did the embedding (a separate one with workers > 1)
+            print(f"Embedding cache: {embeddings.get_stats()}")
+        if parent_store is not None:
+            # Drop the sections of books that were removed from the corpus
+            parent_store.retain_sources(manifest.sources())
     except Exception as e:
         print(f"Error: {e}")
         
 def get_retriever():
+    """
+    Similarity-threshold retriever over the shared vector store
 
-    retriever = vector_store.as_retriever(
-        #
-        search_type="similarity_score_threshold",
-        search_kwargs={
-            'k': 25,        # Increased to get more complete context
-            'score_threshold': 0.8  # Slightly lower to catch related chunks
-        },
+    Doesn't connect until the first query; ainvoke() runs the search on the
+    shared search thread pool.
+    """
+    retriever = LazyVectorStoreRetriever(
+        shared_store=shared_vector_store,
+        k=25,                # Increased to get more complete context
+        score_threshold=0.8  # Slightly lower to catch related chunks
     )
-    
-    
 
     return retriever
 
+def get_hybrid_retriever():
+    """
+    Dense retriever fused with the persisted BM25 index (reciprocal rank fusion)
+
+    Falls back to the dense retriever if the BM25 index hasn't been built yet.
+    """
+    bm25_index = BM25Index.load(get_setting("BM25_INDEX_PATH", DEFAULT_BM25_PATH))
+    if bm25_index is None:
+        logger.warning("BM25 index not found, run split_chunks() to build it. Using dense retrieval only.")
+        return get_retriever()
+
+    return HybridRetriever(
+        dense_retriever=get_retriever(),
+        bm25_index=bm25_index,
+        k=25,
+        sparse_k=25,
+    )
+
+def get_parent_retriever(retriever):
+    """
+    Resolve a child-chunk retriever's results to their parent sections
+
+    For collections ingested with CHUNK_MODE 'parent'. At most PARENT_SECTIONS
+    distinct sections are returned, in the order of their best-ranked child.
+    """
+    return ParentDocumentRetriever(
+        child_retriever=retriever,
+        parent_store=get_parent_store(),
+        max_parents=int(get_setting("PARENT_SECTIONS", DEFAULT_MAX_PARENTS)),
+    )
+
+def get_cached_retriever(retriever):
+    """
+    Wrap a retriever in the semantic retrieval-result cache
+
+    Cached results are dropped automatically when ingestion changes the collection.
+    """
+    return CachedRetriever(
+        retriever=retriever,
+        embeddings=embedding_func,
+        similarity_threshold=float(get_setting("RETRIEVAL_CACHE_THRESHOLD", 0.95)),
+        max_entries=int(get_setting("RETRIEVAL_CACHE_SIZE", 512)),
+        ttl=float(get_setting("RETRIEVAL_CACHE_TTL", 1800)),
+        manifest_path=get_setting("INGEST_MANIFEST_PATH", DEFAULT_MANIFEST_PATH),
+    )
+
 def get_vector_store():
-    return vector_store    
\ No newline at end of file
+    """Return the shared vector store, connecting on first call"""
+    return shared_vector_store.get()
+
+def get_vector_store_stats():
+    """Connect time and query latency (p50/p95/max, ms) of the shared vector store"""
+    return shared_vector_store.metrics.snapshot()
@@ -0,0 +1,32 @@
+"""
+Runtime settings lookup
+
+Settings are read from Streamlit secrets first (as the app does for API keys)
+and then from environment variables, so offline scripts such as ingestion and
+benchmarks can be configured without a secrets file.
+"""
+
+import os
+from typing import Any
+
+import streamlit as st
+
+
+def get_setting(key: str, default: Any = None) -> Any:
+    """
+    Look up a setting by name
+
+    Args:
+        key: Setting name, e.g. "EMBEDDING_BACKEND"
+        default: Value returned when the setting is not defined anywhere
+
+    Returns:
+        The configured value, or default
+    """
+    try:
+        if key in st.secrets:
+            return st.secrets[key]
+    except Exception:
+        # No secrets.toml available (e.g. running an offline script)
+        pass
+    return os.environ.get(key, default)
@@ -0,0 +1,115 @@
+"""
+Token-budgeted context packing
+
+Chunks are split with a 500-character overlap, so neighbouring chunks that
+are retrieved together repeat text in the prompt. The packer merges chunks
+from the same source whose `start_index` ranges overlap or touch into one
+passage, then fills a token budget with the merged passages in relevance
+order.
+"""
+
+import logging
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+from utils.model import count_tokens
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOKEN_BUDGET = 6000
+
+
+def merge_overlapping_chunks(documents: List[Document]) -> List[Document]:
+    """
+    Merge chunks of the same source whose character ranges overlap or are adjacent
+
+    Chunks without a `start_index` are kept as they are. A merged passage
+    keeps the metadata of its first chunk (parent_id, section, scores, ...)
+    with start_index, end_index and merged_chunks set for the whole passage.
+    The result is ordered by the best (lowest) relevance rank among each
+    passage's chunks.
+
+    Args:
+        documents: Chunks in relevance order
+
+    Returns:
+        Merged passages in relevance order
+    """
+    passages = []  # [best rank, source, start, end, text, chunk count, first chunk's metadata]
+    unmergeable = []
+    by_source = {}
+    for rank, document in enumerate(documents):
+        start = document.metadata.get("start_index")
+        if start is None or start < 0:
+            unmergeable.append((rank, document))
+            continue
+        by_source.setdefault(document.metadata.get("source"), []).append((int(start), rank, document))
+
+    for source, chunks in by_source.items():
+        chunks.sort(key=lambda chunk: chunk[0])
+        current = None
+        for start, rank, document in chunks:
+            text = document.page_content
+            end = start + len(text)
+            if current is not None and start <= current[3]:
+                # Overlapping or adjacent: append only the part not already covered
+                if end > current[3]:
+                    current[4] += text[current[3] - start:]
+                    current[3] = end
+                current[0] = min(current[0], rank)
+                current[5] += 1
+                continue
+            if current is not None:
+                passages.append(current)
+            current = [rank, source, start, end, text, 1, document.metadata]
+        if current is not None:
+            passages.append(current)
+
+    merged = [
+        (rank, Document(
+            page_content=text,
+            metadata={**metadata, "source": source, "start_index": start, "end_index": end,
+                      "merged_chunks": count},
+        ))
+        for rank, source, start, end, text, count, metadata in passages
+    ]
+    merged.extend(unmergeable)
+    merged.sort(key=lambda pair: pair[0])
+    return [document for _, document in merged]
+
+
+def pack_context(documents: List[Document], token_budget: int = DEFAULT_TOKEN_BUDGET,
+                 separator: str = "\n\n", model: Optional[str] = None) -> List[Document]:
+    """
+    Merge overlapping chunks and keep passages, in relevance order, while they fit the budget
+
+    A passage that doesn't fit is skipped so that smaller, less relevant
+    passages can still use the remaining budget.
+
+    Args:
+        documents: Chunks in relevance order
+        token_budget: Maximum tokens for the joined context
+        separator: String placed between passages
+        model: Model whose tokenizer is used for counting (default: the chat model)
+
+    Returns:
+        Packed passages in relevance order
+    """
+    count = (lambda text: count_tokens(text, model)) if model else count_tokens
+    separator_tokens = count(separator)
+
+    packed = []
+    used = 0
+    for document in merge_overlapping_chunks(documents):
+        tokens = count(document.page_content) + (separator_tokens if packed else 0)
+        if used + tokens > token_budget:
+            continue
+        packed.append(document)
+        used += tokens
+    return packed
@@ -1,7 +1,17 @@
 # Description: This script converts a PDF file to a Markdown 
 import pathlib
 import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pymupdf
 import pymupdf4llm
+from utils.config import get_setting
+from utils.ingestion_manifest import file_sha256
+
+# Records the size, mtime and sha256 of every converted PDF so unchanged
+# books are skipped on the next run
+DEFAULT_CONVERSION_MANIFEST_PATH = "data/index/conversion_manifest.json"
 
 def pdf_to_md():
     try:
@@ -31,24 +41,139 @@ def pdf_to_md():
     except Exception as e:
         print(f"Error: {e}")
 
-def convert_all_pdfs_to_md():
+def iter_pdf_pages(pdf_file):
+    """
+    Convert a PDF to markdown one page at a time
+
+    Only the current page's markdown is held in memory, so very large books
+    can be streamed into the chunker. Header levels are computed once for the
+    whole document so they match a full to_markdown() conversion.
+
+    Yields:
+        (1-based page number, markdown text of the page)
+    """
+    with pymupdf.open(str(pdf_file)) as doc:
+        # Not available when pymupdf4llm runs in layout mode, which detects headers itself
+        identify_headers = getattr(pymupdf4llm, "IdentifyHeaders", None)
+        options = {"hdr_info": identify_headers(doc)} if identify_headers else {}
+        for page_index in range(doc.page_count):
+            page_chunks = pymupdf4llm.to_markdown(doc, pages=[page_index], page_chunks=True, **options)
+            yield page_index + 1, "".join(chunk["text"] for chunk in page_chunks)
+
+def load_conversion_manifest(path=DEFAULT_CONVERSION_MANIFEST_PATH):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_conversion_manifest(manifest, path=DEFAULT_CONVERSION_MANIFEST_PATH):
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def needs_conversion(pdf_file, md_file_path, entry):
+    """
+    Check a PDF against its manifest entry
+
+    Returns:
+        (needs conversion, sha256 of the PDF or None if it wasn't computed)
+    """
+    if not entry or not md_file_path.exists():
+        return True, None
+    stat = pdf_file.stat()
+    if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+        return False, entry.get("sha256")
+    # Touched but possibly unchanged (e.g. copied again): fall back to the hash
+    pdf_hash = file_sha256(pdf_file)
+    return pdf_hash != entry.get("sha256"), pdf_hash
+
+def convert_pdf_to_md(pdf_file, md_file_path):
+    """
+    Convert one PDF and write its markdown atomically
+
+    Runs in a worker process.
+
+    Returns:
+        Seconds spent converting
+    """
+    start = time.perf_counter()
+    md_text = pymupdf4llm.to_markdown(str(pdf_file))
+    tmp_path = md_file_path.with_suffix(".md.tmp")
+    tmp_path.write_bytes(md_text.encode())
+    os.replace(tmp_path, md_file_path)
+    return time.perf_counter() - start
+
+def convert_all_pdfs_to_md(workers=None, force=False):
+    """
+    Convert every PDF in data/books/ to data/md/, in parallel and incrementally
+
+    PDFs whose size and mtime (or, failing that, sha256) match the conversion
+    manifest and whose markdown output still exists are skipped.
+
+    Args:
+        workers: Number of conversion processes (default: CONVERT_WORKERS setting, or the CPU count)
+        force: Convert every PDF even if it is unchanged
+    """
     try:
         # Path to books directory
         books_dir = pathlib.Path("data/books/")
         md_output_dir = pathlib.Path("data/md/")
         md_output_dir.mkdir(parents=True, exist_ok=True)  # Ensure md directory exists
+        manifest_path = get_setting("CONVERSION_MANIFEST_PATH", DEFAULT_CONVERSION_MANIFEST_PATH)
+        manifest = load_conversion_manifest(manifest_path)
+        workers = int(workers or get_setting("CONVERT_WORKERS", os.cpu_count() or 1))
 
-        # Loop through all PDF files in the books directory
-        for pdf_file in books_dir.glob("*.pdf"):
-            md_text = pymupdf4llm.to_markdown(str(pdf_file))
-            name_of_file = pdf_file.stem  # Filename without extension
+        # Work out which PDFs changed since the last run
+        pending = {}
+        skipped = 0
+        for pdf_file in sorted(books_dir.glob("*.pdf")):
+            md_file_path = md_output_dir / f"{pdf_file.stem}.md"
+            changed, pdf_hash = needs_conversion(pdf_file, md_file_path, manifest.get(pdf_file.name))
+            if changed or force:
+                pending[pdf_file] = (md_file_path, pdf_hash)
+            else:
+                skipped += 1
+                # Remember the new mtime so the hash isn't recomputed next time
+                stat = pdf_file.stat()
+                manifest[pdf_file.name].update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        print(f"{len(pending)} PDF(s) to convert, {skipped} unchanged")
 
-            # Ensure the markdown file ends with .md
-            md_file_path = md_output_dir / f"{name_of_file}.md"
-            md_file_path.write_bytes(md_text.encode())
+        start = time.perf_counter()
+        failed = 0
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(pending) or 1))) as executor:
+            futures = {
+                executor.submit(convert_pdf_to_md, pdf_file, md_file_path): pdf_file
+                for pdf_file, (md_file_path, _) in pending.items()
+            }
+            for future in as_completed(futures):
+                pdf_file = futures[future]
+                md_file_path, pdf_hash = pending[pdf_file]
+                try:
+                    seconds = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"Failed to convert {pdf_file}: {e}")
+                    continue
 
-            print(f"Markdown file created: {md_file_path}")
-            # print(pdf_file)
+                stat = pdf_file.stat()
+                manifest[pdf_file.name] = {
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "sha256": pdf_hash or file_sha256(pdf_file),
+                    "markdown": str(md_file_path),
+                    "seconds": round(seconds, 2),
+                }
+                # Checkpoint after every book so an interrupted rebuild resumes
+                save_conversion_manifest(manifest, manifest_path)
+                print(f"Markdown file created: {md_file_path} ({seconds:.1f}s)")
+
+        save_conversion_manifest(manifest, manifest_path)
+        print(f"Converted {len(pending) - failed} PDF(s) in {time.perf_counter() - start:.1f}s "
+              f"with {workers} worker(s), {skipped} skipped, {failed} failed")
 
     except Exception as e:
-        print(f"Error: {e}")
\ No newline at end of file
+        print(f"Error: {e}")
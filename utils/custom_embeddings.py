@@ -1,15 +1,141 @@
 from sentence_transformers import SentenceTransformer
 from langchain.embeddings.base import Embeddings
-from typing import List
+from typing import Dict, List, Tuple
+from utils.config import get_setting
+import logging
+import threading
+import time
+import numpy as np
+
+DEFAULT_MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+DEFAULT_BATCH_SIZE = 64
+
+# Inference backends selectable through the EMBEDDING_BACKEND setting
+#   torch      - PyTorch fp32 (original behaviour)
+#   int8       - PyTorch with dynamic int8 quantization of the Linear layers
+#   onnx       - ONNX Runtime fp32 (needs `optimum[onnxruntime]`)
+#   onnx-int8  - ONNX Runtime with the pre-quantized int8 export from the hub
+EMBEDDING_BACKENDS = ("torch", "int8", "onnx", "onnx-int8")
+DEFAULT_BACKEND = "torch"
+ONNX_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+###
+### Process-wide model registry: each model is loaded once, on first use
+###
+
+_models: Dict[Tuple[str, str], SentenceTransformer] = {}
+_load_seconds: Dict[Tuple[str, str], float] = {}
+_registry_lock = threading.Lock()
+
+def get_default_backend() -> str:
+    """Return the configured embedding backend"""
+    backend = str(get_setting("EMBEDDING_BACKEND", DEFAULT_BACKEND)).lower()
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"EMBEDDING_BACKEND must be one of {EMBEDDING_BACKENDS}, got '{backend}'")
+    return backend
+
+def load_sentence_transformer(model_name: str, backend: str) -> SentenceTransformer:
+    """Build a SentenceTransformer for the requested inference backend"""
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+
+    if backend == "int8":
+        import torch
+        model = SentenceTransformer(model_name, device="cpu")
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    if backend in ("onnx", "onnx-int8"):
+        model_kwargs = {"file_name": ONNX_INT8_FILE} if backend == "onnx-int8" else None
+        try:
+            return SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+        except ImportError as e:
+            raise ImportError(
+                "The ONNX embedding backend needs `pip install optimum[onnxruntime]` "
+                "and sentence-transformers>=3.2"
+            ) from e
+
+    raise ValueError(f"Unknown embedding backend '{backend}'. Expected one of {EMBEDDING_BACKENDS}")
+
+def get_sentence_transformer(model_name: str = DEFAULT_MODEL_NAME, backend: str = DEFAULT_BACKEND) -> SentenceTransformer:
+    """Return the shared SentenceTransformer for (model_name, backend), loading it if needed"""
+    key = (model_name, backend)
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _registry_lock:
+        # Another thread may have finished loading while we waited
+        if key not in _models:
+            start = time.perf_counter()
+            _models[key] = load_sentence_transformer(model_name, backend)
+            _load_seconds[key] = time.perf_counter() - start
+            logger.info(f"Loaded embedding model {model_name} ({backend}) in {_load_seconds[key]:.2f}s")
+        return _models[key]
+
+def warmup_embedding_model(model_name: str = DEFAULT_MODEL_NAME, backend: str = None) -> float:
+    """
+    Load a model ahead of the first request and run one encode pass
+
+    Returns:
+        Seconds spent loading the model (0 if it was already resident)
+    """
+    key = (model_name, backend or get_default_backend())
+    already_loaded = key in _models
+    get_sentence_transformer(*key).encode(["warmup"], show_progress_bar=False)
+    return 0.0 if already_loaded else _load_seconds[key]
+
+def get_model_load_stats() -> Dict[str, float]:
+    """Return load time in seconds for every model loaded in this process"""
+    return {f"{name} ({backend})": seconds for (name, backend), seconds in _load_seconds.items()}
 
 class MyEmbeddings(Embeddings):
-        def __init__(self):
-            self.model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-    
-        def embed_documents(self, texts: List[str]) -> List[List[float]]:
-            return [self.model.encode(t).tolist() for t in texts]
-        
-        def embed_query(self, text: str) -> List[float]:
-            return self.model.encode(text).tolist()
-
-embedding_func = MyEmbeddings()
\ No newline at end of file
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, batch_size: int = DEFAULT_BATCH_SIZE,
+                 normalize: bool = False, backend: str = None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.normalize = normalize
+        self.backend = backend or get_default_backend()
+
+    @property
+    def model(self) -> SentenceTransformer:
+        return get_sentence_transformer(self.model_name, self.backend)
+
+    @property
+    def model_id(self) -> str:
+        """Identifier used to namespace cached vectors; fp32 torch keeps the bare model name"""
+        return self.model_name if self.backend == "torch" else f"{self.model_name}@{self.backend}"
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts in batches of `batch_size` with a single call to the model
+
+        Returns:
+            C-contiguous float32 array of shape (len(texts), dim)
+        """
+        if not texts:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=self.normalize,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+# Shared instance; the model itself is only loaded on first encode
+embedding_func = MyEmbeddings()
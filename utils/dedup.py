@@ -0,0 +1,92 @@
+"""
+Near-duplicate chunk detection
+
+Our textbooks repeat standard definitions and pseudocode almost verbatim.
+Each chunk gets a 64-bit SimHash over word 3-shingles; two chunks whose
+fingerprints differ in at most `max_distance` bits are near-duplicates.
+Lookups use the pigeonhole trick: with 4 bands of 16 bits and
+max_distance <= 3, any near-duplicate shares at least one band exactly.
+"""
+
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_MAX_DISTANCE = 3
+SHINGLE_SIZE = 3
+BANDS = 4
+BAND_BITS = 64 // BANDS
+
+_WORD_PATTERN = re.compile(r"\w+")
+_BIT_POSITIONS = np.arange(64, dtype=np.uint64)
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def simhash(text: str, shingle_size: int = SHINGLE_SIZE) -> int:
+    """Return the 64-bit SimHash fingerprint of a text"""
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) < shingle_size:
+        features = [" ".join(words)] if words else [""]
+    else:
+        features = {" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)}
+
+    hashes = np.fromiter((_feature_hash(f) for f in features), dtype=np.uint64)
+    # Vote per bit position: +1 where the feature hash has the bit set, -1 otherwise
+    bits = ((hashes[:, None] >> _BIT_POSITIONS) & np.uint64(1)).astype(np.int32)
+    votes = 2 * bits.sum(axis=0) - len(hashes)
+    fingerprint = 0
+    for position in np.nonzero(votes > 0)[0]:
+        fingerprint |= 1 << int(position)
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class SimHashIndex:
+    """Banded index of fingerprints for near-duplicate lookup."""
+
+    def __init__(self, max_distance: int = DEFAULT_MAX_DISTANCE):
+        if max_distance >= BANDS:
+            raise ValueError(f"max_distance must be below {BANDS} for banded lookup")
+        self.max_distance = max_distance
+        self._bands: List[Dict[int, List[Tuple[int, str, str]]]] = [{} for _ in range(BANDS)]
+        self._by_source: Dict[str, List[Tuple[int, str]]] = {}
+
+    @staticmethod
+    def _band_values(fingerprint: int) -> List[int]:
+        mask = (1 << BAND_BITS) - 1
+        return [(fingerprint >> (band * BAND_BITS)) & mask for band in range(BANDS)]
+
+    def add(self, key: str, fingerprint: int, source: str):
+        """Add a chunk fingerprint under a key (e.g. the chunk hash)"""
+        for band, value in enumerate(self._band_values(fingerprint)):
+            self._bands[band].setdefault(value, []).append((fingerprint, key, source))
+        self._by_source.setdefault(source, []).append((fingerprint, key))
+
+    def remove_source(self, source: str):
+        """Forget every fingerprint added for a source"""
+        entries = self._by_source.pop(source, [])
+        keys = {key for _, key in entries}
+        for fingerprint, _ in entries:
+            for band, value in enumerate(self._band_values(fingerprint)):
+                bucket = self._bands[band].get(value)
+                if bucket:
+                    bucket[:] = [entry for entry in bucket if not (entry[2] == source and entry[1] in keys)]
+
+    def find(self, fingerprint: int) -> Optional[Tuple[str, str]]:
+        """Return (key, source) of a near-duplicate, or None"""
+        for band, value in enumerate(self._band_values(fingerprint)):
+            for candidate, key, source in self._bands[band].get(value, ()):
+                if hamming_distance(candidate, fingerprint) <= self.max_distance:
+                    return key, source
+        return None
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._by_source.values())
@@ -0,0 +1,244 @@
+"""
+Disk-backed embedding cache
+
+Embeddings are stored in SQLite keyed by (model name, sha256 of the text) so
+re-ingesting an unchanged corpus or repeating a question costs a lookup
+instead of a forward pass.
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = "data/cache/embeddings.db"
+DEFAULT_QUERY_CACHE_SIZE = 1024
+DEFAULT_QUERY_CACHE_TTL = 3600  # seconds
+
+
+def text_hash(text: str) -> str:
+    """Return the sha256 hex digest of a text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase and collapse whitespace so trivially different queries share a key"""
+    return " ".join(text.lower().split())
+
+
+class QueryEmbeddingLRU:
+    """
+    Bounded in-process LRU cache for query embeddings with a per-entry TTL.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_QUERY_CACHE_SIZE, ttl: Optional[float] = DEFAULT_QUERY_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text: str) -> Optional[List[float]]:
+        """Return the cached embedding for a query, or None"""
+        key = normalize_query(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                vector, stored_at = entry
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, text: str, vector: List[float]):
+        """Store a query embedding, evicting the least recently used entry if full"""
+        key = normalize_query(text)
+        with self._lock:
+            self._entries[key] = (vector, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, float]:
+        """Return size, hit-rate and eviction counters"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wrap an Embeddings instance with a persistent SQLite cache.
+
+    The wrapped instance must expose a `model_id` or `model_name` attribute so
+    that vectors from different models or backends never collide. Queries are additionally served from
+    an in-process LRU cache before touching SQLite.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache_path: str = DEFAULT_CACHE_PATH,
+                 query_cache: Optional[QueryEmbeddingLRU] = None):
+        self.embeddings = embeddings
+        self.query_cache = query_cache if query_cache is not None else QueryEmbeddingLRU()
+        self.model_name = getattr(embeddings, "model_id", getattr(embeddings, "model_name", type(embeddings).__name__))
+        self.cache_path = cache_path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+        self.initialize_cache()
+
+    def create_connection(self):
+        """Create and return a cache connection."""
+        return sqlite3.connect(self.cache_path)
+
+    def initialize_cache(self):
+        """Create the cache table if it doesn't exist."""
+        conn = self.create_connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model_name TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model_name, text_hash)
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def _lookup(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """Fetch cached vectors for the given hashes"""
+        found = {}
+        conn = self.create_connection()
+        try:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model_name = ? AND text_hash IN ({placeholders})",
+                    (self.model_name, *batch),
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        finally:
+            conn.close()
+        return found
+
+    def _store(self, items: Dict[str, np.ndarray]):
+        """Persist freshly computed vectors"""
+        if not items:
+            return
+        conn = self.create_connection()
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model_name, text_hash, dim, vector) VALUES (?, ?, ?, ?)",
+                [
+                    (self.model_name, key, len(vector), np.asarray(vector, dtype=np.float32).tobytes())
+                    for key, vector in items.items()
+                ],
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not write to embedding cache: {e}")
+        finally:
+            conn.close()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Return embeddings for texts, computing only those missing from the cache
+
+        Returns:
+            float32 array of shape (len(texts), dim)
+        """
+        texts = list(texts)
+        if not texts:
+            # Same (0, dim) shape as the wrapped model returns
+            if hasattr(self.embeddings, "encode"):
+                return np.asarray(self.embeddings.encode([]), dtype=np.float32)
+            return np.empty((0, len(self.embeddings.embed_query(" "))), dtype=np.float32)
+
+        hashes = [text_hash(t) for t in texts]
+        cached = self._lookup(list(set(hashes)))
+
+        missing = {}
+        for key, text in zip(hashes, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        miss_count = sum(1 for key in hashes if key in missing)
+        with self._lock:
+            self.misses += miss_count
+            self.hits += len(hashes) - miss_count
+
+        if missing:
+            if hasattr(self.embeddings, "encode"):
+                vectors = self.embeddings.encode(list(missing.values()))
+            else:
+                vectors = np.asarray(self.embeddings.embed_documents(list(missing.values())), dtype=np.float32)
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed)
+            cached.update(computed)
+
+        return np.ascontiguousarray(np.stack([cached[key] for key in hashes]), dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.query_cache.get(text)
+        if vector is None:
+            # The MiniLM tokenizer is uncased, so the normalized text embeds identically
+            vector = self.encode([normalize_query(text)])[0].tolist()
+            self.query_cache.put(text, vector)
+        return vector
+
+    def get_stats(self) -> Dict[str, float]:
+        """Return hit/miss counters for the disk cache and the query LRU"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "query_cache": self.query_cache.get_stats(),
+        }
+
+    def clear(self, model_name: Optional[str] = None):
+        """Delete cached vectors for one model (default: this model)"""
+        conn = self.create_connection()
+        conn.execute("DELETE FROM embeddings WHERE model_name = ?", (model_name or self.model_name,))
+        conn.commit()
+        conn.close()
@@ -0,0 +1,97 @@
+"""
+Multi-process embedding for bulk corpus ingestion
+
+Texts are sharded across a pool of worker processes, each holding its own
+copy of the embedding model, and the shard results are reassembled in the
+original order. Use this for full rebuilds; the app itself keeps using the
+single in-process model from utils.custom_embeddings.
+"""
+
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+
+from utils.custom_embeddings import DEFAULT_BATCH_SIZE, DEFAULT_MODEL_NAME, MyEmbeddings
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARD_SIZE = 256
+
+# Per-process embedding instance, set up by _init_worker
+_worker_embeddings: Optional[MyEmbeddings] = None
+
+
+def _init_worker(model_name: str, backend: str, batch_size: int, normalize: bool, threads: int):
+    """Load the model once per worker and cap its intra-op threads"""
+    global _worker_embeddings
+    import torch
+    torch.set_num_threads(threads)
+    _worker_embeddings = MyEmbeddings(model_name=model_name, batch_size=batch_size,
+                                      normalize=normalize, backend=backend)
+    _worker_embeddings.model  # force the load inside the worker
+
+
+def _encode_shard(texts: List[str]) -> np.ndarray:
+    return _worker_embeddings.encode(texts)
+
+
+class ParallelEmbeddings(MyEmbeddings):
+    """
+    MyEmbeddings variant that shards large encode calls across processes.
+
+    Small inputs (fewer than two shards) are encoded in-process. The pool is
+    started on first use and kept until close() so that repeated batches from
+    a streaming ingestion don't pay the model load again.
+    """
+
+    def __init__(self, workers: Optional[int] = None, shard_size: int = DEFAULT_SHARD_SIZE,
+                 model_name: str = DEFAULT_MODEL_NAME, batch_size: int = DEFAULT_BATCH_SIZE,
+                 normalize: bool = False, backend: str = None):
+        super().__init__(model_name=model_name, batch_size=batch_size, normalize=normalize, backend=backend)
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_size = shard_size
+        self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            logger.info(f"Starting embedding pool with {self.workers} workers ({threads} threads each)")
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                # spawn avoids inheriting torch's thread pools through fork
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name, self.backend, self.batch_size, self.normalize, threads),
+            )
+        return self._executor
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        texts = list(texts)
+        if self.workers <= 1 or len(texts) < 2 * self.shard_size:
+            return super().encode(texts)
+
+        shards = [texts[i:i + self.shard_size] for i in range(0, len(texts), self.shard_size)]
+        # Executor.map yields results in submission order, so shards reassemble in place
+        results = list(self._get_executor().map(_encode_shard, shards))
+        return np.ascontiguousarray(np.concatenate(results), dtype=np.float32)
+
+    def close(self):
+        """Shut down the worker pool"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
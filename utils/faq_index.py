@@ -0,0 +1,324 @@
+"""
+FAQ answer index
+
+Canonical questions ("What is a linked list?") are asked over and over at the
+same three levels. The FAQ index stores a ready answer per (question,
+user_level) together with the question embedding; the text workflow
+consults it before classifying the input and returns a stored answer when a
+new question matches a canonical one closely enough, without any LLM call.
+
+The index is populated offline:
+    - from chat.db: questions asked in several different chats at the same
+      level, with the most recent assistant answer
+    - from the corpus: canonical questions answered by running the text
+      workflow (retrieval + synthesis) once per level
+
+Usage:
+    python -m utils.faq_index --from-chat-db chat.db --min-chats 2
+    python -m utils.faq_index --from-corpus --questions faq_questions.txt
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+from utils.embedding_cache import normalize_query
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_FAQ_PATH = "data/index/faq.db"
+DEFAULT_SIMILARITY_THRESHOLD = 0.92
+USER_LEVELS = ("beginner", "intermediate", "advanced")
+MIN_ANSWER_CHARS = 200  # shorter assistant replies are redirects/pleasantries, not answers
+
+DEFAULT_FAQ_QUESTIONS = [
+    "What is an array?",
+    "What is a linked list?",
+    "What is a stack?",
+    "What is a queue?",
+    "What is a hash table?",
+    "What is a binary tree?",
+    "What is a binary search tree?",
+    "What is a heap?",
+    "What is a graph?",
+    "What is a trie?",
+    "What is recursion?",
+    "What is dynamic programming?",
+    "What is a greedy algorithm?",
+    "What is Big O notation?",
+    "How does binary search work?",
+    "How does bubble sort work?",
+    "How does merge sort work?",
+    "How does quicksort work?",
+    "What is breadth-first search?",
+    "What is depth-first search?",
+    "How does Dijkstra's algorithm work?",
+]
+
+
+class FAQIndex:
+    """SQLite-backed FAQ answers with an in-memory embedding matrix per level."""
+
+    def __init__(self, embeddings: Embeddings, path: str = DEFAULT_FAQ_PATH,
+                 similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD):
+        self.embeddings = embeddings
+        self.path = path
+        self.similarity_threshold = similarity_threshold
+        self._lock = threading.Lock()
+        self._loaded_mtime = None
+        # level -> (normalized questions, unit vectors, answers)
+        self._levels: Dict[str, Tuple[List[str], np.ndarray, List[str]]] = {}
+        self._exact: Dict[Tuple[str, str], str] = {}
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.initialize_index()
+
+    def create_connection(self):
+        """Create and return an index connection."""
+        return sqlite3.connect(self.path)
+
+    def initialize_index(self):
+        """Create the faq table if it doesn't exist."""
+        conn = self.create_connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS faq (
+                normalized_question TEXT NOT NULL,
+                user_level TEXT NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                origin TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (normalized_question, user_level)
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    # ===== Population =====
+
+    def add_entries(self, entries: List[Tuple[str, str, str]], origin: str):
+        """
+        Store (question, user_level, answer) entries, replacing existing ones
+
+        Args:
+            entries: List of (question, user_level, answer)
+            origin: Where the answers came from, e.g. 'chat' or 'corpus'
+        """
+        entries = [(q, level.lower(), a) for q, level, a in entries if level.lower() in USER_LEVELS]
+        if not entries:
+            return
+        vectors = np.asarray(self.embeddings.embed_documents([q for q, _, _ in entries]), dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        conn = self.create_connection()
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO faq (normalized_question, user_level, question, answer, origin, vector) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (normalize_query(q), level, q, a, origin, vector.tobytes())
+                    for (q, level, a), vector in zip(entries, vectors)
+                ],
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        logger.info(f"Stored {len(entries)} FAQ entries from {origin}")
+
+    def clear(self, origin: Optional[str] = None):
+        conn = self.create_connection()
+        if origin:
+            conn.execute("DELETE FROM faq WHERE origin = ?", (origin,))
+        else:
+            conn.execute("DELETE FROM faq")
+        conn.commit()
+        conn.close()
+
+    # ===== Lookup =====
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._loaded_mtime:
+            return
+        conn = self.create_connection()
+        try:
+            rows = conn.execute("SELECT normalized_question, user_level, answer, vector FROM faq").fetchall()
+        finally:
+            conn.close()
+        grouped: Dict[str, Tuple[List[str], List[np.ndarray], List[str]]] = {}
+        for normalized, level, answer, blob in rows:
+            questions, vectors, answers = grouped.setdefault(level, ([], [], []))
+            questions.append(normalized)
+            vectors.append(np.frombuffer(blob, dtype=np.float32))
+            answers.append(answer)
+        self._levels = {
+            level: (questions, np.stack(vectors), answers)
+            for level, (questions, vectors, answers) in grouped.items()
+        }
+        self._exact = {
+            (normalized, level): answer
+            for level, (questions, _, answers) in self._levels.items()
+            for normalized, answer in zip(questions, answers)
+        }
+        self._loaded_mtime = mtime
+        logger.info(f"Loaded {len(rows)} FAQ entries")
+
+    def lookup(self, question: str, user_level: str) -> Optional[Tuple[str, float]]:
+        """
+        Find a stored answer for a question at a level
+
+        Returns:
+            (answer, similarity) if a canonical question matches at or above
+            the similarity threshold, else None
+        """
+        user_level = (user_level or "").lower()
+        normalized = normalize_query(question)
+        with self._lock:
+            self._reload_if_changed()
+            answer = self._exact.get((normalized, user_level))
+            if answer is not None:
+                return answer, 1.0
+            level_entries = self._levels.get(user_level)
+        if level_entries is None:
+            return None
+
+        _, matrix, answers = level_entries
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        vector /= max(float(np.linalg.norm(vector)), 1e-12)
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] >= self.similarity_threshold:
+            return answers[best], float(scores[best])
+        return None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._reload_if_changed()
+            return sum(len(questions) for questions, _, _ in self._levels.values())
+
+
+# ===== Offline population =====
+
+def frequent_chat_answers(chat_db_path: str, min_chats: int = 2) -> List[Tuple[str, str, str]]:
+    """
+    Collect canonical questions and their latest answers from chat.db
+
+    A user message directly followed by an assistant message in the same chat
+    is a question/answer pair. Questions asked in at least `min_chats`
+    different chats at the same level are kept, with the most recent answer.
+    The level is the user's current level (messages don't record it).
+
+    Returns:
+        List of (question, user_level, answer)
+    """
+    conn = sqlite3.connect(chat_db_path)
+    try:
+        rows = conn.execute('''
+            SELECT m.chat_id, m.role, m.content, u.user_level
+            FROM messages m JOIN users u ON u.user_id = m.user_id
+            ORDER BY m.chat_id, m.message_id
+        ''').fetchall()
+    finally:
+        conn.close()
+
+    # (normalized question, level) -> [chats, latest question text, latest answer]
+    pairs: Dict[Tuple[str, str], list] = {}
+    for (chat_id, role, content, level), (next_chat_id, next_role, next_content, _) in zip(rows, rows[1:]):
+        level = (level or "").lower()
+        if (role != "user" or next_role != "assistant" or next_chat_id != chat_id
+                or level not in USER_LEVELS or len(next_content) < MIN_ANSWER_CHARS):
+            continue
+        entry = pairs.setdefault((normalize_query(content), level), [set(), content, next_content])
+        entry[0].add(chat_id)
+        entry[1], entry[2] = content, next_content
+
+    return [
+        (question, level, answer)
+        for (_, level), (chats, question, answer) in pairs.items()
+        if len(chats) >= min_chats
+    ]
+
+
+def corpus_answers(questions: Iterable[str], answer_question: Callable[[str, str], Optional[str]],
+                   levels: Iterable[str] = USER_LEVELS) -> List[Tuple[str, str, str]]:
+    """
+    Answer canonical questions from the corpus at every level
+
+    Args:
+        questions: Canonical questions
+        answer_question: Function (question, user_level) -> answer, e.g. one
+            run of the text workflow
+        levels: Levels to answer at
+
+    Returns:
+        List of (question, user_level, answer)
+    """
+    entries = []
+    for question in questions:
+        for level in levels:
+            start = time.perf_counter()
+            answer = answer_question(question, level)
+            if answer and len(answer) >= MIN_ANSWER_CHARS:
+                entries.append((question, level, answer))
+                logger.info(f"Answered {question!r} ({level}) in {time.perf_counter() - start:.1f}s")
+            else:
+                logger.warning(f"No usable answer for {question!r} ({level})")
+    return entries
+
+
+def answer_with_text_workflow(question: str, user_level: str) -> Optional[str]:
+    """Run the text workflow once, without the FAQ shortcut, and return its answer"""
+    from langchain_core.messages import HumanMessage
+    from templates.text_template import create_retrieval_graph
+
+    graph = create_retrieval_graph(use_faq=False).compile()
+    output = graph.invoke({"messages": [HumanMessage(content=question)], "user_level": user_level})
+    return output["messages"][-1].content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=DEFAULT_FAQ_PATH, help="FAQ index to write")
+    parser.add_argument("--from-chat-db", help="Add frequent questions and answers from this chat database")
+    parser.add_argument("--min-chats", type=int, default=2, help="Chats a question must appear in")
+    parser.add_argument("--from-corpus", action="store_true", help="Answer canonical questions with the text workflow")
+    parser.add_argument("--questions", help="File with one canonical question per line (default: built-in list)")
+    parser.add_argument("--clear", action="store_true", help="Remove existing entries of the sources being rebuilt")
+    args = parser.parse_args()
+
+    from utils.chunk_doc import embedding_func
+    index = FAQIndex(embedding_func, args.path)
+
+    if args.from_chat_db:
+        if args.clear:
+            index.clear("chat")
+        index.add_entries(frequent_chat_answers(args.from_chat_db, args.min_chats), origin="chat")
+    if args.from_corpus:
+        if args.clear:
+            index.clear("corpus")
+        if args.questions:
+            with open(args.questions, "r") as f:
+                questions = [line.strip() for line in f if line.strip()]
+        else:
+            questions = DEFAULT_FAQ_QUESTIONS
+        index.add_entries(corpus_answers(questions, answer_with_text_workflow), origin="corpus")
+    print(f"FAQ index {args.path}: {len(index)} entries")
+
+
+if __name__ == "__main__":
+    main()
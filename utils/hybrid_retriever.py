@@ -0,0 +1,312 @@
+"""
+Hybrid sparse + dense retrieval
+
+A BM25 index over the same chunks that are embedded into the vector store is
+built at ingestion time and persisted to disk. At query time the BM25 ranking
+and the dense ranking are combined with reciprocal rank fusion (RRF), which
+recovers keyword-heavy queries ("Kadane", "Dijkstra O(E log V)") that pure
+embedding search tends to miss.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import pickle
+import re
+import sqlite3
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_BM25_PATH = "data/index/bm25.pkl"
+RRF_K = 60  # Standard RRF damping constant
+# BM25Okapi parameters (rank_bm25 defaults)
+BM25_K1 = 1.5
+BM25_B = 0.75
+BM25_EPSILON = 0.25
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokenizer shared by indexing and querying"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def document_key(document: Document) -> str:
+    """Stable identity for a chunk across the dense and sparse indexes"""
+    source = document.metadata.get("source", "")
+    return hashlib.sha256(f"{source}\x00{document.page_content}".encode("utf-8")).hexdigest()
+
+
+class ChunkTextStore:
+    """SQLite store of the text and metadata of BM25-indexed chunks, keyed by document_key."""
+
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.initialize_store()
+
+    def create_connection(self):
+        """Create and return a store connection."""
+        return sqlite3.connect(self.path)
+
+    def initialize_store(self):
+        """Create the chunks table if it doesn't exist."""
+        conn = self.create_connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS chunks (
+                key TEXT PRIMARY KEY,
+                source TEXT,
+                metadata TEXT NOT NULL,
+                text TEXT NOT NULL
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks (source)")
+        conn.commit()
+        conn.close()
+
+    def add(self, keys: List[str], documents: List[Document]):
+        conn = self.create_connection()
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunks (key, source, metadata, text) VALUES (?, ?, ?, ?)",
+                [(key, doc.metadata.get("source"), json.dumps(doc.metadata), doc.page_content)
+                 for key, doc in zip(keys, documents)],
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def remove_source(self, source: str):
+        conn = self.create_connection()
+        try:
+            conn.execute("DELETE FROM chunks WHERE source = ?", (source,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get(self, keys: List[str]) -> Dict[str, Document]:
+        """Documents for the given keys; keys that aren't stored are missing"""
+        if not keys:
+            return {}
+        conn = self.create_connection()
+        try:
+            placeholders = ",".join("?" * len(keys))
+            rows = conn.execute(
+                f"SELECT key, metadata, text FROM chunks WHERE key IN ({placeholders})", list(keys)
+            ).fetchall()
+        finally:
+            conn.close()
+        return {key: Document(page_content=text, metadata=json.loads(metadata)) for key, metadata, text in rows}
+
+
+def chunk_text_path(index_path: str) -> str:
+    """Chunk text store that belongs to a BM25 index file"""
+    return str(Path(index_path).with_suffix(".sqlite"))
+
+
+class BM25Index:
+    """
+    BM25 (Okapi) index over chunk documents, persisted with pickle
+
+    Only the postings (term -> chunk positions and term frequencies), chunk
+    keys, sources and lengths are kept in memory; the chunk text lives in a
+    ChunkTextStore next to the index file and is read for the hits of a
+    search. Changes are queued and applied by rebuild(), which compacts
+    removed chunks and merges new ones without re-tokenizing the corpus.
+    Scores match rank_bm25's BM25Okapi.
+    """
+
+    def __init__(self, path: str = DEFAULT_BM25_PATH, documents: Iterable[Document] = ()):
+        self.path = path
+        self.text_store = ChunkTextStore(chunk_text_path(path))
+        self.keys: List[str] = []
+        self.doc_sources: List[str] = []
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.idf: Dict[str, float] = {}
+        self.avgdl = 0.0
+        self.indexed_sources = set()
+        self._pending: List[Tuple[str, str, Counter]] = []
+        self._removed_sources = set()
+        self.add_documents(documents)
+        self.rebuild()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("text_store", None)
+        return state
+
+    def rebuild(self):
+        """Apply queued additions and removals and recompute the BM25 statistics"""
+        if self._removed_sources:
+            keep = np.array([source not in self._removed_sources for source in self.doc_sources], dtype=bool)
+            new_positions = np.cumsum(keep) - 1
+            postings = {}
+            for term, (positions, frequencies) in self.postings.items():
+                mask = keep[positions]
+                if mask.any():
+                    postings[term] = (new_positions[positions[mask]].astype(np.int32), frequencies[mask])
+            self.postings = postings
+            self.keys = [key for key, kept in zip(self.keys, keep) if kept]
+            self.doc_sources = [source for source, kept in zip(self.doc_sources, keep) if kept]
+            self.doc_lengths = self.doc_lengths[keep]
+            self._removed_sources = set()
+
+        if self._pending:
+            added: Dict[str, Tuple[List[int], List[int]]] = {}
+            lengths = []
+            for key, source, counts in self._pending:
+                position = len(self.keys)
+                self.keys.append(key)
+                self.doc_sources.append(source)
+                lengths.append(sum(counts.values()))
+                for term, frequency in counts.items():
+                    positions, frequencies = added.setdefault(term, ([], []))
+                    positions.append(position)
+                    frequencies.append(frequency)
+            for term, (positions, frequencies) in added.items():
+                new = (np.array(positions, dtype=np.int32), np.array(frequencies, dtype=np.float32))
+                old = self.postings.get(term)
+                self.postings[term] = new if old is None else (np.concatenate([old[0], new[0]]),
+                                                               np.concatenate([old[1], new[1]]))
+            self.doc_lengths = np.concatenate([self.doc_lengths, np.array(lengths, dtype=np.float32)])
+            self._pending = []
+
+        # Same IDF as BM25Okapi, including its floor for very common terms
+        count = len(self.keys)
+        self.avgdl = float(self.doc_lengths.mean()) if count else 0.0
+        self.idf = {term: math.log(count - len(positions) + 0.5) - math.log(len(positions) + 0.5)
+                    for term, (positions, _) in self.postings.items()}
+        if self.idf:
+            floor = BM25_EPSILON * sum(self.idf.values()) / len(self.idf)
+            self.idf = {term: (value if value >= 0 else floor) for term, value in self.idf.items()}
+
+    def sources(self) -> set:
+        """Indexed sources, including ones that contributed no chunks"""
+        return set(self.indexed_sources)
+
+    def replace_source(self, source: str, documents: List[Document]):
+        """Swap all chunks of one source for a new set (call rebuild() afterwards)"""
+        self.remove_source(source)
+        self.add_documents(documents)
+        self.indexed_sources.add(source)
+
+    def add_documents(self, documents: Iterable[Document]):
+        """Queue chunks for indexing and store their text (call rebuild() afterwards)"""
+        documents = list(documents)
+        keys = [document_key(doc) for doc in documents]
+        self.indexed_sources.update(doc.metadata.get("source") for doc in documents)
+        self.text_store.add(keys, documents)
+        self._pending.extend((key, doc.metadata.get("source"), Counter(tokenize(doc.page_content)))
+                             for key, doc in zip(keys, documents))
+
+    def remove_source(self, source: str):
+        self.indexed_sources.discard(source)
+        self._pending = [entry for entry in self._pending if entry[1] != source]
+        self._removed_sources.add(source)
+        self.text_store.remove_source(source)
+
+    def search(self, query: str, k: int) -> List[Tuple[Document, float]]:
+        """Return up to k documents with a positive BM25 score, best first"""
+        if not self.keys:
+            return []
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        scores = np.zeros(len(self.keys), dtype=np.float32)
+        for token in tokens:
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            positions, frequencies = posting
+            lengths = self.doc_lengths[positions]
+            scores[positions] += self.idf[token] * frequencies * (BM25_K1 + 1) / (
+                frequencies + BM25_K1 * (1 - BM25_B + BM25_B * lengths / self.avgdl))
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = [n for n in top[np.argsort(-scores[top])] if scores[n] > 0]
+        documents = self.text_store.get([self.keys[n] for n in top])
+        return [(documents[self.keys[n]], float(scores[n])) for n in top if self.keys[n] in documents]
+
+    def save(self, path: Optional[str] = None):
+        path = path or self.path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = Path(f"{path}.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(path)
+
+    @staticmethod
+    def load(path: str = DEFAULT_BM25_PATH) -> Optional["BM25Index"]:
+        """Load a persisted index, or return None if it hasn't been built"""
+        if not Path(path).exists():
+            return None
+        with open(path, "rb") as f:
+            index = pickle.load(f)
+        if hasattr(index, "documents"):
+            # Indexes pickled with their chunk text: move the text to the store
+            logger.info(f"Converting BM25 index {path} to postings + chunk text store")
+            migrated = BM25Index(path, index.documents)
+            migrated.indexed_sources |= getattr(index, "indexed_sources", set())
+            return migrated
+        index.path = path
+        index.text_store = ChunkTextStore(chunk_text_path(path))
+        return index
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int, rrf_k: int = RRF_K) -> List[Document]:
+    """
+    Fuse several ranked lists: score(d) = sum over lists of 1 / (rrf_k + rank)
+
+    Args:
+        rankings: Ranked document lists, best first
+        k: Number of fused documents to return
+        rrf_k: Damping constant
+
+    Returns:
+        Top k documents by fused score
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            key = document_key(document)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, document)
+    ordered = sorted(scores, key=scores.get, reverse=True)
+    return [documents[key] for key in ordered[:k]]
+
+
+class HybridRetriever(BaseRetriever):
+    """Combine a dense retriever with a BM25 index using reciprocal rank fusion."""
+
+    dense_retriever: BaseRetriever
+    bm25_index: BM25Index
+    k: int = 25
+    sparse_k: int = 25
+    rrf_k: int = RRF_K
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        dense_docs = self.dense_retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        sparse_docs = [doc for doc, _ in self.bm25_index.search(query, self.sparse_k)]
+        fused = reciprocal_rank_fusion([dense_docs, sparse_docs], k=self.k, rrf_k=self.rrf_k)
+        logger.info(f"Hybrid retrieval: {len(dense_docs)} dense + {len(sparse_docs)} sparse -> {len(fused)} fused")
+        return fused
@@ -0,0 +1,191 @@
+"""
+Ingestion manifest
+
+Records, for every ingested markdown file, the sha256 of the file and of each
+chunk together with the vector-store primary key the chunk was written under.
+Ingestion compares the corpus against it so that only new or changed chunks
+are embedded and upserted, chunks that disappeared are deleted, and an
+unchanged corpus is a no-op.
+"""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_MANIFEST_PATH = "data/index/manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path) -> str:
+    """Hash a file's bytes without reading it into memory at once"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def document_chunk_hash(document) -> str:
+    """
+    Manifest key of a chunk Document
+
+    Child chunks of parent-document retrieval include their parent_id, so a
+    child whose section changed is rewritten with the new parent reference.
+    """
+    parent_id = document.metadata.get("parent_id")
+    if parent_id is None:
+        return chunk_sha256(document.page_content)
+    return chunk_sha256(f"{parent_id}\0{document.page_content}")
+
+
+class IngestionManifest:
+    """
+    JSON manifest of ingested files and chunks.
+
+    Layout:
+        {
+          "version": 1,
+          "generation": <incremented every time the collection changes>,
+          "files": {
+            "<source>": {
+              "file_hash": "...",
+              "complete": true,
+              "chunks": {"<chunk hash>": <pk>, ...},
+              "fingerprints": {"<chunk hash>": <64-bit simhash>, ...},
+              "dropped": {"<chunk hash>": ["<source>", "<chunk hash>"], ...}
+            }
+          }
+        }
+
+    "dropped" maps chunks left out as near-duplicates to the chunk (source and
+    chunk hash) they duplicate; if that chunk goes away, the file has to be
+    ingested again to restore the content.
+
+    The manifest is saved once per finished file. Chunks written for a file
+    that is still in progress are appended to a journal next to it
+    (<manifest>.journal, one JSON line per batch), so after an interruption
+    the chunks of the unfinished file can be found and deleted before the
+    file is ingested again.
+    """
+
+    def __init__(self, path: str = DEFAULT_MANIFEST_PATH):
+        self.path = Path(path)
+        self.journal_path = self.path.with_suffix(self.path.suffix + ".journal")
+        self.generation = 0
+        self.files: Dict[str, dict] = {}
+        self.load()
+
+    def load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, "r") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            logger.warning(f"Ignoring manifest {self.path} with unsupported version {data.get('version')}")
+            return
+        self.generation = data.get("generation", 0)
+        self.files = data.get("files", {})
+
+    def save(self):
+        """Write the manifest atomically"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "generation": self.generation, "files": self.files}, f)
+        tmp_path.replace(self.path)
+        # Everything journaled so far belongs to files recorded above
+        self.journal_path.unlink(missing_ok=True)
+
+    def journal_chunks(self, source: str, pks: List[object]):
+        """Append the primary keys of chunks written for an unfinished file to the journal"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.journal_path, "a") as f:
+            f.write(json.dumps({"source": source, "pks": list(pks)}) + "\n")
+
+    def interrupted_chunks(self) -> Dict[str, List[object]]:
+        """Return {source: primary keys} written by an interrupted run for files it didn't finish"""
+        if not self.journal_path.exists():
+            return {}
+        interrupted: Dict[str, List[object]] = {}
+        with open(self.journal_path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line
+                interrupted.setdefault(entry["source"], []).extend(entry["pks"])
+        return interrupted
+
+    def sources(self) -> List[str]:
+        return list(self.files)
+
+    def file_hash(self, source: str) -> Optional[str]:
+        entry = self.files.get(source)
+        return entry["file_hash"] if entry else None
+
+    def is_current(self, source: str, file_hash: str) -> bool:
+        """True if the source was fully ingested at this file hash"""
+        entry = self.files.get(source)
+        return bool(entry) and entry["file_hash"] == file_hash and entry.get("complete", True)
+
+    def chunk_pks(self, source: str) -> Dict[str, object]:
+        """Return {chunk hash: primary key} for a source"""
+        entry = self.files.get(source)
+        return dict(entry["chunks"]) if entry else {}
+
+    def fingerprints(self, source: str) -> Dict[str, int]:
+        """Return {chunk hash: simhash} for the chunks of a source"""
+        entry = self.files.get(source)
+        return dict(entry.get("fingerprints", {})) if entry else {}
+
+    def set_file(self, source: str, file_hash: str, chunks: Dict[str, object], complete: bool = True,
+                 fingerprints: Optional[Dict[str, int]] = None, dropped: Optional[Dict[str, list]] = None):
+        self.files[source] = {
+            "file_hash": file_hash,
+            "complete": complete,
+            "chunks": dict(chunks),
+            "fingerprints": dict(fingerprints or {}),
+            "dropped": dict(dropped or {}),
+        }
+
+    def missing_duplicate_targets(self) -> List[str]:
+        """Return the sources with near-duplicate drops whose kept chunk no longer exists"""
+        return [
+            source for source, entry in self.files.items()
+            if any(target_hash not in self.files.get(target_source, {}).get("chunks", {})
+                   for target_source, target_hash in entry.get("dropped", {}).values())
+        ]
+
+    def mark_incomplete(self, source: str):
+        """Force the next ingestion run to process a source again"""
+        if source in self.files:
+            self.files[source]["complete"] = False
+
+    def add_chunks(self, source: str, file_hash: str, chunks: Dict[str, object],
+                   fingerprints: Optional[Dict[str, int]] = None):
+        """Record newly written chunks of a file that is still being ingested"""
+        entry = self.files.setdefault(source, {"file_hash": file_hash, "complete": False, "chunks": {}})
+        entry["file_hash"] = file_hash
+        entry["complete"] = False
+        entry["chunks"].update(chunks)
+        entry.setdefault("fingerprints", {}).update(fingerprints or {})
+
+    def remove_file(self, source: str):
+        self.files.pop(source, None)
+
+    def bump_generation(self):
+        """Mark that the collection contents changed"""
+        self.generation += 1
@@ -0,0 +1,445 @@
+"""
+Streaming corpus ingestion
+
+Ingestion runs as a chain of generator stages connected by bounded queues:
+
+    read + split  ->  embed (batches)  ->  write (batches)
+
+Each stage runs in its own thread, so reading the next file, embedding and
+writing to the vector store overlap, while the bounded queues keep at most a
+few batches in flight no matter how large the corpus is. The ingestion
+manifest is saved after every finished file, which is the checkpoint a
+restarted run resumes from; chunks written for the file in progress are
+journaled so an interrupted run can clean them up.
+"""
+
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from langchain_core.documents import Document
+
+from utils.hybrid_retriever import BM25Index
+from utils.dedup import SimHashIndex, simhash
+from utils.ingestion_manifest import IngestionManifest, document_chunk_hash, file_sha256
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_QUEUE_SIZE = 4
+
+_END_OF_STREAM = object()
+
+
+# ===== Pipeline events =====
+
+@dataclass
+class FileStarted:
+    source: str
+    file_hash: str
+
+
+@dataclass
+class ChunkToEmbed:
+    source: str
+    file_hash: str
+    chunk_hash: str
+    document: Document
+    fingerprint: Optional[int] = None
+
+
+@dataclass
+class EmbeddedBatch:
+    chunks: List[ChunkToEmbed]
+    vectors: List[List[float]]
+
+
+@dataclass
+class KeywordBatch:
+    """Chunks of a file for the BM25 index; the first batch of a file replaces its old chunks"""
+    source: str
+    documents: List[Document]
+    first: bool = False
+
+
+@dataclass
+class FileFinished:
+    source: str
+    file_hash: str
+    seen_hashes: set
+    dropped: Dict[str, list] = field(default_factory=dict)  # chunk hash -> [kept source, kept chunk hash]
+
+
+@dataclass
+class IngestionStats:
+    files_total: int = 0
+    files_done: int = 0
+    files_skipped: int = 0
+    files_removed: int = 0
+    files_keyword_indexed: int = 0  # unchanged files added to a BM25 index that lacked them
+    chunks_written: int = 0
+    chunks_deleted: int = 0
+    chunks_seen: int = 0
+    duplicates_dropped: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def dedup_report(self) -> str:
+        if not self.chunks_seen:
+            return "no chunks examined"
+        return (f"{self.duplicates_dropped} of {self.chunks_seen} chunks dropped as near-duplicates "
+                f"(index {self.duplicates_dropped / self.chunks_seen:.1%} smaller)")
+
+
+# ===== Stages =====
+
+def run_in_thread(events: Iterable, maxsize: int = DEFAULT_QUEUE_SIZE) -> Iterator:
+    """
+    Drain an iterator on a background thread through a bounded queue
+
+    The producer blocks when the queue is full, which is what bounds memory.
+    Exceptions raised by the producer are re-raised in the consumer. If the
+    consumer stops early (e.g. a write fails), the producer stops too and
+    closes its upstream stages instead of blocking forever.
+    """
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for event in events:
+                if not put(event):
+                    break
+        except BaseException as e:
+            put(e)
+        finally:
+            close = getattr(events, "close", None)
+            if close is not None:
+                close()
+            put(_END_OF_STREAM)
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            event = buffer.get()
+            if event is _END_OF_STREAM:
+                return
+            if isinstance(event, BaseException):
+                raise event
+            yield event
+    finally:
+        stop.set()
+
+
+def flush_store(store):
+    """Persist buffered writes for stores that buffer them (LocalVectorStore); Zilliz writes through"""
+    flush = getattr(store, "flush", None)
+    if flush is not None:
+        flush()
+
+
+def build_dedup_index(manifest: IngestionManifest, max_distance: int) -> SimHashIndex:
+    """Seed a SimHash index with the fingerprints of every chunk already ingested"""
+    index = SimHashIndex(max_distance=max_distance)
+    for source in manifest.sources():
+        for chunk_hash, fingerprint in manifest.fingerprints(source).items():
+            index.add(chunk_hash, fingerprint, source)
+    return index
+
+
+def keyword_batches(source: str, documents: Iterable[Document], batch_size: int) -> Iterator[KeywordBatch]:
+    """Group a file's chunks into KeywordBatch events; always yields at least one"""
+    batch = []
+    first = True
+    for document in documents:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield KeywordBatch(source, batch, first)
+            batch, first = [], False
+    if batch or first:
+        yield KeywordBatch(source, batch, first)
+
+
+def read_and_split(md_files: List[Path], manifest: IngestionManifest,
+                   split_file: Callable[[Path], Iterable[Document]], stats: IngestionStats,
+                   dedup_index: Optional[SimHashIndex] = None, keyword_sources: Optional[set] = None,
+                   batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator:
+    """
+    Stage 1: split each changed file and yield its chunks that still need embedding
+
+    Chunks already recorded in the manifest for this source (unchanged, or
+    written before an interruption) are not yielded again. With a dedup
+    index, chunks that are near-duplicates of a chunk already in the
+    collection (or earlier in this run) are dropped before embedding, and
+    the chunk each one duplicates is recorded so the drop can be undone if
+    that chunk goes away.
+
+    With keyword_sources (the sources already in the BM25 index), the kept
+    chunks are also yielded in KeywordBatch events of at most batch_size,
+    and unchanged files missing from the BM25 index are split for it alone.
+    """
+    for md_file in md_files:
+        source = str(md_file)
+        file_hash = file_sha256(md_file)
+        if manifest.is_current(source, file_hash):
+            if keyword_sources is not None and source not in keyword_sources:
+                # e.g. first run after an upgrade: nothing to embed, but BM25 needs the chunks
+                stats.files_keyword_indexed += 1
+                yield from keyword_batches(source, split_file(md_file), batch_size)
+            else:
+                stats.files_skipped += 1
+            continue
+
+        known_chunks = manifest.chunk_pks(source)
+        known_fingerprints = manifest.fingerprints(source)
+        if dedup_index is not None:
+            # This file's previous chunks are being replaced; don't match against them
+            dedup_index.remove_source(source)
+
+        seen_hashes = set()
+        keyword_batch = []
+        first_keyword_batch = True
+        dropped = {}
+        yield FileStarted(source, file_hash)
+        for document in split_file(md_file):
+            chunk_hash = document_chunk_hash(document)
+            if chunk_hash in seen_hashes:
+                continue  # identical chunk already present in this file
+            seen_hashes.add(chunk_hash)
+            stats.chunks_seen += 1
+
+            fingerprint = None
+            if dedup_index is not None:
+                fingerprint = known_fingerprints.get(chunk_hash)
+                if fingerprint is None:
+                    fingerprint = simhash(document.page_content)
+                match = dedup_index.find(fingerprint) if chunk_hash not in known_chunks else None
+                if match is not None:
+                    kept_hash, kept_source = match
+                    dropped[chunk_hash] = [kept_source, kept_hash]
+                    stats.duplicates_dropped += 1
+                    continue
+                dedup_index.add(chunk_hash, fingerprint, source)
+
+            if chunk_hash not in known_chunks:
+                yield ChunkToEmbed(source, file_hash, chunk_hash, document, fingerprint)
+            if keyword_sources is not None:
+                keyword_batch.append(document)
+                if len(keyword_batch) >= batch_size:
+                    yield KeywordBatch(source, keyword_batch, first_keyword_batch)
+                    keyword_batch, first_keyword_batch = [], False
+        if keyword_sources is not None and (keyword_batch or first_keyword_batch):
+            yield KeywordBatch(source, keyword_batch, first_keyword_batch)
+        yield FileFinished(source, file_hash, seen_hashes, dropped)
+
+
+def embed_batches(events: Iterable, encode: Callable, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator:
+    """
+    Stage 2: group chunks into batches and embed them
+
+    Control events are passed through in order, after flushing any partial
+    batch. Keyword batches don't need the file's vectors and pass straight through.
+    """
+    pending: List[ChunkToEmbed] = []
+
+    def flush():
+        vectors = encode([chunk.document.page_content for chunk in pending])
+        return EmbeddedBatch(list(pending), vectors.tolist())
+
+    for event in events:
+        if isinstance(event, ChunkToEmbed):
+            pending.append(event)
+            if len(pending) >= batch_size:
+                yield flush()
+                pending.clear()
+            continue
+        if isinstance(event, KeywordBatch):
+            yield event
+            continue
+        if pending:
+            yield flush()
+            pending.clear()
+        yield event
+    if pending:
+        yield flush()
+
+
+def write_batches(events: Iterable, store, manifest: IngestionManifest,
+                  bm25_index: Optional[BM25Index], stats: IngestionStats):
+    """
+    Stage 3: write embedded batches and checkpoint the manifest after each file
+    """
+    for event in events:
+        if isinstance(event, FileStarted):
+            logger.info(f"Ingesting {event.source}")
+
+        elif isinstance(event, EmbeddedBatch):
+            pks = store.add_embeddings(
+                texts=[chunk.document.page_content for chunk in event.chunks],
+                embeddings=event.vectors,
+                metadatas=[chunk.document.metadata for chunk in event.chunks],
+            )
+            written: Dict[tuple, Dict[str, object]] = {}
+            fingerprints: Dict[tuple, Dict[str, int]] = {}
+            for chunk, pk in zip(event.chunks, pks):
+                written.setdefault((chunk.source, chunk.file_hash), {})[chunk.chunk_hash] = pk
+                if chunk.fingerprint is not None:
+                    fingerprints.setdefault((chunk.source, chunk.file_hash), {})[chunk.chunk_hash] = chunk.fingerprint
+            for (source, file_hash), chunks in written.items():
+                manifest.add_chunks(source, file_hash, chunks, fingerprints.get((source, file_hash)))
+                manifest.journal_chunks(source, list(chunks.values()))
+
+            stats.chunks_written += len(pks)
+            logger.info(f"Progress: {stats.files_done}/{stats.files_total} files, "
+                        f"{stats.chunks_written} chunks written "
+                        f"({stats.chunks_written / max(stats.elapsed(), 1e-9):.1f} chunks/sec)")
+
+        elif isinstance(event, KeywordBatch):
+            if bm25_index is not None:
+                if event.first:
+                    bm25_index.replace_source(event.source, event.documents)
+                else:
+                    bm25_index.add_documents(event.documents)
+
+        elif isinstance(event, FileFinished):
+            # Everything of this file is written; drop chunks that no longer exist in it
+            chunks = manifest.chunk_pks(event.source)
+            chunk_fingerprints = manifest.fingerprints(event.source)
+            stale = {chunk_hash: pk for chunk_hash, pk in chunks.items() if chunk_hash not in event.seen_hashes}
+            if stale:
+                store.delete(ids=list(stale.values()))
+                stats.chunks_deleted += len(stale)
+            manifest.set_file(
+                event.source,
+                event.file_hash,
+                {chunk_hash: pk for chunk_hash, pk in chunks.items() if chunk_hash in event.seen_hashes},
+                complete=True,
+                fingerprints={chunk_hash: fp for chunk_hash, fp in chunk_fingerprints.items()
+                              if chunk_hash in event.seen_hashes},
+                dropped=event.dropped,
+            )
+            flush_store(store)
+            manifest.bump_generation()
+            manifest.save()
+            stats.files_done += 1
+
+
+def read_file_and_chunk(chunker: Callable[[Path, str], List[Document]]) -> Callable[[Path], List[Document]]:
+    """Adapt a (path, text) chunker to one that reads the file itself"""
+    def split_file(path: Path) -> List[Document]:
+        with open(path, "r") as f:
+            return chunker(path, f.read())
+    return split_file
+
+
+def run_ingestion(md_dir: Path, store, encode: Callable, chunker: Optional[Callable[[Path, str], List[Document]]],
+                  manifest: IngestionManifest, bm25_path: Optional[str] = None,
+                  batch_size: int = DEFAULT_BATCH_SIZE, queue_size: int = DEFAULT_QUEUE_SIZE,
+                  dedup_max_distance: Optional[int] = None, pattern: str = "*.md",
+                  file_chunker: Optional[Callable[[Path], Iterable[Document]]] = None) -> IngestionStats:
+    """
+    Sync a directory of markdown files into a vector store, streaming
+
+    Args:
+        md_dir: Directory with the markdown corpus
+        store: Vector store exposing add_embeddings and delete (and flush, if it buffers writes)
+        encode: Function mapping a list of texts to a float32 array
+        chunker: Function mapping (path, text) to chunk Documents
+        manifest: Ingestion manifest, also used as the resume checkpoint
+        bm25_path: Where to keep the BM25 index in step (None to skip)
+        batch_size: Chunks per embedding/write batch
+        queue_size: Maximum batches buffered between stages
+        dedup_max_distance: SimHash Hamming distance at or below which a new
+            chunk counts as a near-duplicate and is dropped (None disables)
+        pattern: Glob of the files in md_dir to ingest
+        file_chunker: Function mapping a path to an iterable of chunk Documents,
+            used instead of chunker for sources that are split without being read
+            whole (e.g. PDFs streamed page by page)
+
+    Returns:
+        IngestionStats for the run
+    """
+    md_files = sorted(Path(md_dir).glob(pattern))
+    split_file = file_chunker or read_file_and_chunk(chunker)
+    stats = IngestionStats(files_total=len(md_files))
+    bm25_index = (BM25Index.load(bm25_path) or BM25Index(bm25_path)) if bm25_path else None
+
+    # Chunks an interrupted run wrote for files it didn't finish; those files are ingested again
+    interrupted = manifest.interrupted_chunks()
+    for source, pks in interrupted.items():
+        logger.info(f"Cleaning up {len(pks)} chunk(s) of interrupted file {source}")
+        store.delete(ids=pks)
+    if interrupted:
+        flush_store(store)
+        manifest.bump_generation()
+        manifest.save()
+
+    # Files that disappeared from the corpus (only sources this run is responsible for)
+    present = {str(md_file) for md_file in md_files}
+    removed = [source for source in manifest.sources()
+               if source not in present and Path(source).parent == Path(md_dir) and Path(source).match(pattern)]
+    for source in removed:
+        pks = list(manifest.chunk_pks(source).values())
+        if pks:
+            store.delete(ids=pks)
+        manifest.remove_file(source)
+        flush_store(store)
+        manifest.bump_generation()
+        manifest.save()
+        if bm25_index is not None:
+            bm25_index.remove_source(source)
+        stats.chunks_deleted += len(pks)
+        stats.files_removed += 1
+
+    files_to_ingest = md_files
+    while files_to_ingest:
+        dedup_index = build_dedup_index(manifest, dedup_max_distance) if dedup_max_distance is not None else None
+        keyword_sources = bm25_index.sources() if bm25_index is not None else None
+        events = run_in_thread(read_and_split(files_to_ingest, manifest, split_file, stats, dedup_index,
+                                              keyword_sources, batch_size),
+                               queue_size * batch_size)
+        events = run_in_thread(embed_batches(events, encode, batch_size), queue_size)
+        write_batches(events, store, manifest, bm25_index, stats)
+
+        # Near-duplicates dropped in favour of a chunk that was changed or removed since
+        # have to be ingested again; files outside this run are picked up by their next run
+        dependents = manifest.missing_duplicate_targets()
+        for source in dependents:
+            manifest.mark_incomplete(source)
+        if dependents:
+            manifest.save()
+            logger.info(f"Re-ingesting {len(dependents)} file(s) whose near-duplicate originals changed")
+        files_to_ingest = [md_file for md_file in md_files if str(md_file) in dependents]
+        stats.files_total += len(files_to_ingest)
+
+    if bm25_index is not None and (stats.files_done or stats.files_removed or stats.files_keyword_indexed
+                                   or not Path(bm25_path).exists()):
+        bm25_index.rebuild()
+        bm25_index.save(bm25_path)
+
+    logger.info(f"Ingestion finished in {stats.elapsed():.1f}s: {stats.files_done} file(s) ingested, "
+                f"{stats.files_skipped} unchanged, {stats.files_removed} removed, "
+                f"{stats.chunks_written} chunk(s) written, {stats.chunks_deleted} deleted")
+    if dedup_index is not None:
+        logger.info(f"Near-duplicate filter: {stats.dedup_report()}")
+    return stats
@@ -0,0 +1,216 @@
+"""
+Embedding kNN intent classifier
+
+Labels user input as 'dsa', 'pleasantry' or 'other' without an LLM call. The
+input is embedded with the same MiniLM model as retrieval and compared with a
+bank of labeled examples; the k most similar examples vote, weighted by a
+softmax over their cosine similarities (unrelated sentences still score
+0.2-0.3 with MiniLM, so plain similarity weights would let a handful of weak
+neighbours outvote a near-exact match). Confident decisions are routed
+directly and the rest go to the LLM classifier.
+
+Which labels may be decided locally is measured, not assumed: when the bank
+is first embedded, every example is classified by the others (leave-one-out)
+at the configured threshold, and only labels whose local decisions reach
+the minimum precision are routed locally. The per-label precision is logged.
+
+Pleasantry and out-of-scope examples carry a reply, and a local decision
+answers with the reply of the closest example of the winning label.
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_K = 7
+DEFAULT_CONFIDENCE_THRESHOLD = 0.8  # share of the weighted vote
+DEFAULT_MIN_PRECISION = 0.95        # leave-one-out precision a label needs to be decided locally
+MIN_CALIBRATION_DECISIONS = 5       # ...measured over at least this many local decisions
+TEMPERATURE = 0.05                  # softmax temperature of the vote weights
+MIN_SIMILARITY = 0.35               # inputs unlike every example go to the LLM
+MIN_WORDS_WITH_CONTEXT = 4          # short replies mid-conversation depend on what was said before
+
+_GREETING = "Hello! I'm your DSA tutor. What would you like to learn about data structures or algorithms today?"
+_THANKS = "You're welcome! Let me know if you have any other questions about data structures or algorithms."
+_GOODBYE = "Goodbye, and happy coding! Come back anytime you want to practice data structures and algorithms."
+_ACKNOWLEDGE = "Glad that helped! What would you like to explore next in data structures and algorithms?"
+_OUT_OF_SCOPE = ("That's outside what I can help with, since I focus on data structures and algorithms. "
+                 "Feel free to ask me about arrays, trees, graphs, sorting, dynamic programming or anything else DSA!")
+
+# (text, label, reply); DSA examples need no reply
+EXAMPLE_BANK: List[Tuple[str, str, str]] = [
+    ("What is a linked list?", "dsa", ""),
+    ("Explain how binary search works", "dsa", ""),
+    ("What is the time complexity of quicksort?", "dsa", ""),
+    ("How do I implement a stack using two queues?", "dsa", ""),
+    ("Difference between BFS and DFS", "dsa", ""),
+    ("How does a hash map handle collisions?", "dsa", ""),
+    ("Explain dynamic programming", "dsa", ""),
+    ("What is memoization?", "dsa", ""),
+    ("How do I reverse a binary tree?", "dsa", ""),
+    ("Find the longest increasing subsequence", "dsa", ""),
+    ("What is Big O notation?", "dsa", ""),
+    ("Why is heap sort not stable?", "dsa", ""),
+    ("How does Dijkstra's algorithm work?", "dsa", ""),
+    ("What's a trie used for?", "dsa", ""),
+    ("Explain recursion with an example", "dsa", ""),
+    ("Two sum problem solution in Python", "dsa", ""),
+    ("How to detect a cycle in a graph", "dsa", ""),
+    ("What is amortized analysis?", "dsa", ""),
+    ("merge sort vs quick sort", "dsa", ""),
+    ("space complexity of recursion", "dsa", ""),
+    ("Can you give me an example?", "dsa", ""),
+    ("Why is that the worst case?", "dsa", ""),
+    ("Can you explain that step again in more detail?", "dsa", ""),
+    ("Show me the code for it", "dsa", ""),
+    ("Give me a practice problem on graphs", "dsa", ""),
+    ("My solution gets a time limit exceeded error, how can I optimize it?", "dsa", ""),
+    ("Hi", "pleasantry", _GREETING),
+    ("Hello there!", "pleasantry", _GREETING),
+    ("Good morning", "pleasantry", _GREETING),
+    ("Hey, how are you?", "pleasantry", _GREETING),
+    ("Thanks!", "pleasantry", _THANKS),
+    ("Thank you so much, that was helpful", "pleasantry", _THANKS),
+    ("Thanks a lot for the explanation", "pleasantry", _THANKS),
+    ("Appreciate it", "pleasantry", _THANKS),
+    ("Bye", "pleasantry", _GOODBYE),
+    ("See you later", "pleasantry", _GOODBYE),
+    ("Good night, talk to you tomorrow", "pleasantry", _GOODBYE),
+    ("Okay, got it", "pleasantry", _ACKNOWLEDGE),
+    ("That makes sense now", "pleasantry", _ACKNOWLEDGE),
+    ("Cool, great explanation", "pleasantry", _ACKNOWLEDGE),
+    ("What's the weather like today?", "other", _OUT_OF_SCOPE),
+    ("Who won the football match yesterday?", "other", _OUT_OF_SCOPE),
+    ("Tell me a joke", "other", _OUT_OF_SCOPE),
+    ("Recommend me a good movie", "other", _OUT_OF_SCOPE),
+    ("What is the capital of Australia?", "other", _OUT_OF_SCOPE),
+    ("How do I cook pasta?", "other", _OUT_OF_SCOPE),
+    ("Write me a poem about the sea", "other", _OUT_OF_SCOPE),
+    ("What's the latest news?", "other", _OUT_OF_SCOPE),
+    ("How do I center a div in CSS?", "other", _OUT_OF_SCOPE),
+    ("Help me write a cover letter", "other", _OUT_OF_SCOPE),
+    ("What stocks should I buy?", "other", _OUT_OF_SCOPE),
+    ("Who is the president of the United States?", "other", _OUT_OF_SCOPE),
+    ("Translate this sentence into French", "other", _OUT_OF_SCOPE),
+    ("What are the symptoms of the flu?", "other", _OUT_OF_SCOPE),
+]
+
+
+class IntentClassifier:
+    """Similarity-weighted kNN over embedded example inputs."""
+
+    def __init__(self, embeddings: Embeddings, examples: List[Tuple[str, str, str]] = EXAMPLE_BANK,
+                 k: int = DEFAULT_K, confidence_threshold: float = DEFAULT_CONFIDENCE_THRESHOLD,
+                 min_similarity: float = MIN_SIMILARITY, min_precision: float = DEFAULT_MIN_PRECISION):
+        self.embeddings = embeddings
+        self.examples = examples
+        self.k = k
+        self.confidence_threshold = confidence_threshold
+        self.min_similarity = min_similarity
+        self.min_precision = min_precision
+        self._matrix: Optional[np.ndarray] = None
+        self._local_labels: Optional[Set[str]] = None
+        self._lock = threading.Lock()
+
+    def _example_matrix(self) -> np.ndarray:
+        # Embedded on first use, so importing the workflow doesn't load the model
+        with self._lock:
+            if self._matrix is None:
+                vectors = np.asarray(self.embeddings.embed_documents([text for text, _, _ in self.examples]),
+                                     dtype=np.float32)
+                self._matrix = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+                logger.info(f"Embedded {len(self.examples)} intent examples")
+            return self._matrix
+
+    def _vote(self, scores: np.ndarray) -> Tuple[str, float, str, float]:
+        nearest = np.argsort(-scores)[:self.k]
+        weights = np.exp((scores[nearest] - scores[nearest[0]]) / TEMPERATURE)
+        votes = defaultdict(float)
+        for i, weight in zip(nearest, weights):
+            votes[self.examples[i][1]] += float(weight)
+        label = max(votes, key=votes.get)
+        confidence = votes[label] / float(weights.sum())
+        reply = next(self.examples[i][2] for i in nearest if self.examples[i][1] == label)
+        return label, confidence, reply, float(scores[nearest[0]])
+
+    def predict(self, question: str) -> Tuple[str, float, str, float]:
+        """
+        Vote over the nearest examples
+
+        Returns:
+            (label, confidence, reply of the closest example with that label,
+            similarity of the closest example overall)
+        """
+        matrix = self._example_matrix()
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        vector /= max(float(np.linalg.norm(vector)), 1e-12)
+        return self._vote(matrix @ vector)
+
+    def label_precision(self) -> Dict[str, Tuple[float, int]]:
+        """
+        Leave-one-out precision of the local decisions per label
+
+        Returns:
+            {label: (precision, local decisions)}; labels never decided
+            locally are missing
+        """
+        matrix = self._example_matrix()
+        decided = defaultdict(lambda: [0, 0])
+        for i, (_, expected, _) in enumerate(self.examples):
+            scores = matrix @ matrix[i]
+            scores[i] = -np.inf
+            label, confidence, _, similarity = self._vote(scores)
+            if similarity >= self.min_similarity and confidence >= self.confidence_threshold:
+                decided[label][0] += label == expected
+                decided[label][1] += 1
+        return {label: (correct / total, total) for label, (correct, total) in decided.items()}
+
+    def local_labels(self) -> Set[str]:
+        """Labels whose leave-one-out precision allows deciding them locally"""
+        with self._lock:
+            if self._local_labels is not None:
+                return self._local_labels
+        precision = self.label_precision()
+        local = {label for label, (value, total) in precision.items()
+                 if value >= self.min_precision and total >= MIN_CALIBRATION_DECISIONS}
+        logger.info("Intent leave-one-out precision: " + ", ".join(
+            f"{label} {value:.2f} ({total})" for label, (value, total) in sorted(precision.items())
+        ) + f"; decided locally: {sorted(local) or 'none'}")
+        with self._lock:
+            self._local_labels = local
+        return local
+
+    def classify(self, question: str, has_context: bool = False) -> Optional[Tuple[str, str]]:
+        """
+        Classify an input if the vote is confident
+
+        Args:
+            question: User's input
+            has_context: Whether there is earlier conversation
+
+        Returns:
+            (label, reply) or None when the LLM should classify
+        """
+        if has_context and len(question.split()) < MIN_WORDS_WITH_CONTEXT:
+            return None
+        label, confidence, reply, similarity = self.predict(question)
+        if similarity < self.min_similarity or confidence < self.confidence_threshold:
+            logger.info(f"Intent not confident locally ({label}, confidence {confidence:.2f}, "
+                        f"similarity {similarity:.2f})")
+            return None
+        if label not in self.local_labels():
+            logger.info(f"Intent '{label}' isn't precise enough locally, asking the LLM")
+            return None
+        logger.info(f"Intent classified locally: {label} (confidence {confidence:.2f})")
+        return label, reply
@@ -0,0 +1,276 @@
+"""
+Local language detection for the input gate
+
+The tutor only answers in English, and every new message used to spend an
+LLM call on deciding whether it is English. Most messages are easy to decide
+locally:
+
+    - Script analysis: letters are grouped by Unicode script. Input with no
+      letters at all (code, formulas, "?") is accepted; input written only in
+      a non-Latin script is rejected. Short Greek runs are math symbols
+      ("Θ(n log n)", "λ") and don't count.
+    - Latin-script input made up mostly of accented words that aren't
+      English loanwords ("Thuật toán sắp xếp nhanh") is rejected. A few
+      accented words among English ones are usually names ("Erdős–Rényi"),
+      so that input is left to the LLM.
+    - Other Latin-script input is scored with a character trigram model: the
+      mean log-likelihood ratio of an English profile against a pooled
+      profile of other Latin-script languages, both built from the sample
+      sentences below. Jargon and abbreviations ("bitmask dp tsp") score
+      negative too, so rejecting needs either a strongly negative score or
+      words from the non-English samples. Very short input is decided from
+      word lists instead.
+
+Anything the detector isn't sure about (mixed scripts, scores near zero) is
+left to the LLM check.
+"""
+
+import logging
+import math
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Mean log-likelihood ratio per trigram needed to decide. Non-English text
+# scores closer to zero because its profile pools many languages.
+DEFAULT_ENGLISH_MARGIN = 0.4
+DEFAULT_NON_ENGLISH_MARGIN = 0.3
+STRONG_NON_ENGLISH_MARGIN = 1.0  # rejects without non-English vocabulary hits
+MIN_VOCABULARY_HITS = 2    # distinct non-English sample words backing a negative score
+MIN_TRIGRAMS = 12          # shorter input is decided from the word lists
+MAX_MATH_GREEK_RUN = 2     # Greek words up to this length are math symbols
+MIN_ACCENTED_WORDS = 2     # unknown words with accented letters that make Latin input suspect
+MIN_ACCENTED_SHARE = 0.2   # suspect input goes to the LLM...
+ACCENTED_MAJORITY = 0.5    # ...unless more than this share of its words is accented
+SMOOTHING = 0.5
+
+ENGLISH_SAMPLES = [
+    "What is the time complexity of binary search on a sorted array?",
+    "Can you explain how a hash table handles collisions?",
+    "How do I reverse a linked list in place without extra memory?",
+    "What's the difference between a stack and a queue?",
+    "Explain dynamic programming with a simple example like the knapsack problem.",
+    "Why is quicksort faster than merge sort in practice even though the worst case is worse?",
+    "How does Dijkstra's algorithm find the shortest path in a weighted graph?",
+    "When should I use breadth first search instead of depth first search?",
+    "I don't understand recursion, could you walk me through the call stack?",
+    "Show me how to implement a min heap and the insert and extract operations.",
+    "What does amortized constant time mean for a dynamic array?",
+    "Is a binary search tree always balanced? What happens when it isn't?",
+    "Give me a practice problem about sliding windows and two pointers.",
+    "How would you detect a cycle in a directed graph?",
+    "Which data structure should I choose for a priority queue?",
+    "The space complexity of this solution is linear because we store every node.",
+    "Topological sorting orders the vertices so that every edge goes forward.",
+    "Tries store strings character by character and share common prefixes.",
+    "Greedy algorithms make the locally optimal choice at each step.",
+    "We keep track of visited nodes so that we never process a vertex twice.",
+    "Hi there! Hello, good morning, how are you doing today?",
+    "Thanks a lot, that was really helpful. Thank you so much!",
+    "Okay, got it. That makes sense now, great explanation.",
+    "Ok, sure, cool, nice. Yeah that works for me.",
+    "Bye, see you later. Have a nice day!",
+    "Sorry, I meant the other one. Could you please repeat that?",
+    "Yes please, go ahead and show me the code.",
+    "No worries, I will try it myself first and come back if I get stuck.",
+    "What's the weather like today and who won the game last night?",
+    "Can you recommend a good movie or tell me a joke?",
+    "I am preparing for coding interviews and want to improve my problem solving skills.",
+]
+
+OTHER_LATIN_SAMPLES = [
+    # Spanish
+    "¿Qué es la complejidad temporal de la búsqueda binaria en un arreglo ordenado?",
+    "Hola, ¿cómo estás? Gracias por tu ayuda, eres muy amable.",
+    "No entiendo la recursión, ¿me puedes explicar cómo funciona la pila de llamadas?",
+    "Quiero aprender estructuras de datos y algoritmos para mis entrevistas.",
+    # French
+    "Quelle est la différence entre une pile et une file d'attente ?",
+    "Bonjour, merci beaucoup pour votre aide, c'est très gentil.",
+    "Je ne comprends pas comment fonctionne le tri rapide, pouvez-vous m'expliquer ?",
+    "Les arbres binaires de recherche permettent une recherche efficace.",
+    # German
+    "Was ist der Unterschied zwischen einem Stapel und einer Warteschlange?",
+    "Hallo, vielen Dank für deine Hilfe, das war sehr nützlich.",
+    "Ich verstehe die dynamische Programmierung nicht, kannst du mir ein Beispiel geben?",
+    "Wie funktioniert der Algorithmus von Dijkstra für kürzeste Wege?",
+    "Kannst du mir bitte zeigen, wie man eine Liste sortiert? Ich lerne gerade für eine Prüfung.",
+    # Portuguese
+    "Qual é a complexidade de tempo da ordenação por mesclagem?",
+    "Olá, obrigado pela ajuda, você é muito gentil.",
+    "Não entendo como funciona uma lista ligada, pode me explicar?",
+    # Italian
+    "Qual è la differenza tra un albero binario e un grafo?",
+    "Ciao, grazie mille per l'aiuto, sei stato molto gentile.",
+    "Non capisco come funziona la ricerca in ampiezza, puoi spiegarmelo?",
+    "Che cosa succede quando la pila è vuota? Vorrei un esempio con il codice.",
+    # Dutch
+    "Wat is het verschil tussen een stapel en een wachtrij?",
+    "Hallo, bedankt voor je hulp, dat was heel nuttig.",
+    "Ik begrijp niet hoe een hashtabel werkt, kun je het uitleggen?",
+    "Kun je mij een voorbeeld geven van een recursieve functie? Dank je wel.",
+    # Indonesian
+    "Apa perbedaan antara tumpukan dan antrian dalam struktur data?",
+    "Halo, terima kasih banyak atas bantuannya, sangat membantu.",
+    "Saya tidak mengerti cara kerja pencarian biner, tolong jelaskan.",
+    "Bisakah kamu memberikan contoh kode untuk mengurutkan daftar angka?",
+    # Turkish
+    "Yığın ve kuyruk arasındaki fark nedir, bana açıklar mısın?",
+    "Merhaba, yardımın için çok teşekkür ederim.",
+    "Bu algoritmanın zaman karmaşıklığı nedir ve neden böyle çalışıyor?",
+    # Polish
+    "Jaka jest różnica między stosem a kolejką w strukturach danych?",
+    "Cześć, dziękuję bardzo za pomoc, to było przydatne.",
+    "Czy możesz wyjaśnić, jak działa drzewo binarne i po co się go używa?",
+    # Vietnamese
+    "Sự khác biệt giữa ngăn xếp và hàng đợi là gì?",
+    "Xin chào, cảm ơn bạn rất nhiều vì đã giúp đỡ.",
+    "Tôi không hiểu đệ quy hoạt động như thế nào, bạn có thể giải thích không?",
+    # Romanized Hindi
+    "Mujhe samajh nahi aaya, kya aap dobara samjha sakte hain?",
+    "Yeh algorithm kaise kaam karta hai, thoda example ke saath batao.",
+    # Swahili
+    "Habari, asante sana kwa msaada wako. Ninataka kujifunza algorithimu.",
+]
+
+_LETTER_RUN = re.compile(r"[^\W\d_]+")
+_CODE_OR_URL = re.compile(r"```.*?```|`[^`]*`|https?://\S+", re.DOTALL)
+
+
+@dataclass
+class LanguageGuess:
+    """Local language decision; label is None when the LLM should decide."""
+    label: Optional[str]  # 'english', 'non_english' or None
+    reason: str
+    score: float = 0.0
+
+
+def char_script(ch: str) -> str:
+    """Unicode script of a letter, e.g. 'LATIN', 'CYRILLIC', 'CJK'"""
+    name = unicodedata.name(ch, "")
+    if not name:
+        return "UNKNOWN"
+    # Fullwidth Latin (from CJK input methods) comes out as 'FULLWIDTH', not 'LATIN'
+    return name.split(" ", 1)[0]
+
+
+def word_trigrams(words: List[str]) -> List[str]:
+    trigrams = []
+    for word in words:
+        padded = f" {word} "
+        trigrams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+def latin_words(text: str) -> List[str]:
+    return [word.lower() for word in _LETTER_RUN.findall(text)]
+
+
+class TrigramModel:
+    """English vs other-Latin-language character trigram model."""
+
+    def __init__(self, english_samples: List[str] = ENGLISH_SAMPLES,
+                 other_samples: List[str] = OTHER_LATIN_SAMPLES, smoothing: float = SMOOTHING):
+        english_words = [w for sample in english_samples for w in latin_words(sample)]
+        other_words = [w for sample in other_samples for w in latin_words(sample)]
+        english = Counter(word_trigrams(english_words))
+        other = Counter(word_trigrams(other_words))
+        vocabulary = len(set(english) | set(other)) + 1
+
+        self.log_ratio: Dict[str, float] = {}
+        english_total = sum(english.values()) + smoothing * vocabulary
+        other_total = sum(other.values()) + smoothing * vocabulary
+        for trigram in set(english) | set(other):
+            self.log_ratio[trigram] = (math.log((english[trigram] + smoothing) / english_total)
+                                       - math.log((other[trigram] + smoothing) / other_total))
+
+        self.english_vocabulary = set(english_words)
+        self.other_vocabulary = set(other_words) - self.english_vocabulary
+
+    def score(self, words: List[str]) -> Tuple[float, int]:
+        """Mean log-likelihood ratio (English over other) per trigram, and the trigram count"""
+        trigrams = word_trigrams(words)
+        if not trigrams:
+            return 0.0, 0
+        # Trigrams seen in neither profile carry no evidence
+        total = sum(self.log_ratio.get(trigram, 0.0) for trigram in trigrams)
+        return total / len(trigrams), len(trigrams)
+
+
+_model: Optional[TrigramModel] = None
+
+
+def get_trigram_model() -> TrigramModel:
+    global _model
+    if _model is None:
+        _model = TrigramModel()
+    return _model
+
+
+def detect_language(text: str, english_margin: float = DEFAULT_ENGLISH_MARGIN,
+                    non_english_margin: float = DEFAULT_NON_ENGLISH_MARGIN) -> LanguageGuess:
+    """
+    Decide locally whether the input is English
+
+    Args:
+        text: User input
+        english_margin: Trigram score needed to accept the input as English
+        non_english_margin: Negative trigram score needed to reject it, together
+            with MIN_VOCABULARY_HITS non-English words (or a score below
+            -STRONG_NON_ENGLISH_MARGIN)
+
+    Returns:
+        LanguageGuess; label None means the input is ambiguous
+    """
+    text = _CODE_OR_URL.sub(" ", text)
+    words = _LETTER_RUN.findall(text)
+
+    latin, foreign = [], []
+    for word in words:
+        scripts = Counter(char_script(ch) for ch in word)
+        script = scripts.most_common(1)[0][0]
+        if script == "GREEK" and len(word) <= MAX_MATH_GREEK_RUN:
+            continue
+        (latin if script == "LATIN" else foreign).append(word)
+
+    if not latin and not foreign:
+        return LanguageGuess("english", "no letters")
+    if foreign and not latin:
+        return LanguageGuess("non_english", "non-Latin script")
+    if foreign:
+        return LanguageGuess(None, "mixed scripts")
+
+    model = get_trigram_model()
+    words = [word.lower() for word in latin]
+    accented = [word for word in words if not word.isascii() and word not in model.english_vocabulary]
+    if len(accented) >= MIN_ACCENTED_WORDS and len(accented) >= MIN_ACCENTED_SHARE * len(words):
+        if len(accented) > ACCENTED_MAJORITY * len(words):
+            return LanguageGuess("non_english", "accented words")
+        return LanguageGuess(None, "some accented words")
+
+    score, count = model.score(words)
+    if count < MIN_TRIGRAMS:
+        # Single letters are variables ("O(n)", "a[i]")
+        words = [word for word in words if len(word) > 1]
+        if all(word in model.english_vocabulary for word in words):
+            return LanguageGuess("english", "known English words", score)
+        if all(word in model.other_vocabulary for word in words):
+            return LanguageGuess("non_english", "known non-English words", score)
+        return LanguageGuess(None, "too short", score)
+    if score >= english_margin:
+        return LanguageGuess("english", "trigram model", score)
+    if score <= -non_english_margin:
+        hits = {word for word in words if len(word) > 1 and word in model.other_vocabulary}
+        if len(hits) >= MIN_VOCABULARY_HITS or score <= -STRONG_NON_ENGLISH_MARGIN:
+            return LanguageGuess("non_english", "trigram model", score)
+        return LanguageGuess(None, "negative score without non-English words", score)
+    return LanguageGuess(None, "trigram score near zero", score)
@@ -0,0 +1,213 @@
+"""
+Local on-disk vector index
+
+A drop-in replacement for the Zilliz collection for development, tests and
+offline evaluation. Vectors are L2-normalised and kept in a float32 `.npy`
+matrix that is memory-mapped for search; texts and metadata live next to it
+in a JSON file. Writes go to a growable in-memory buffer and are persisted
+by flush(), so bulk ingestion rewrites the files once per file instead of
+once per batch. Search is exact (brute-force) cosine similarity, i.e. the
+same ranking as the FLAT/COSINE index we use on Zilliz.
+"""
+
+import json
+import logging
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = "data/index/local"
+VECTORS_FILE = "vectors.npy"
+RECORDS_FILE = "records.json"
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Brute-force cosine vector store persisted to a directory.
+
+    Supports the subset of the VectorStore API the app relies on:
+    add_documents / add_texts / add_embeddings, delete, and
+    as_retriever(search_type="similarity_score_threshold"). Writes are
+    visible to searches immediately but only reach disk on flush().
+    """
+
+    def __init__(self, embedding_function: Embeddings, index_path: str = DEFAULT_INDEX_PATH):
+        self.embedding_function = embedding_function
+        self.index_path = Path(index_path)
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._vectors: Optional[np.ndarray] = None  # memory map or view of _buffer
+        self._buffer: Optional[np.ndarray] = None   # writable, with spare rows to append into
+        self._dirty = False
+        self.load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding_function
+
+    # ===== Persistence =====
+
+    def load(self):
+        """Load the index from disk, memory-mapping the vector matrix"""
+        vectors_file = self.index_path / VECTORS_FILE
+        records_file = self.index_path / RECORDS_FILE
+        if not vectors_file.exists() or not records_file.exists():
+            return
+
+        with open(records_file, "r") as f:
+            records = json.load(f)
+        self._ids = [record["id"] for record in records]
+        self._texts = [record["text"] for record in records]
+        self._metadatas = [record["metadata"] for record in records]
+        self._vectors = np.load(vectors_file, mmap_mode="r")
+        logger.info(f"Loaded local vector index with {len(self._ids)} vectors from {self.index_path}")
+
+    def flush(self):
+        """Persist pending writes, if any"""
+        with self._lock:
+            if self._dirty:
+                self.save()
+
+    def save(self):
+        """Write the index to disk"""
+        self.index_path.mkdir(parents=True, exist_ok=True)
+        vectors = self._vectors if self._vectors is not None else np.empty((0, 0), dtype=np.float32)
+
+        # Write to temporary files first so a crash never leaves a half-written index
+        tmp_vectors = self.index_path / f"{VECTORS_FILE}.tmp"
+        tmp_records = self.index_path / f"{RECORDS_FILE}.tmp"
+        with open(tmp_vectors, "wb") as f:
+            np.save(f, np.asarray(vectors, dtype=np.float32))
+        with open(tmp_records, "w") as f:
+            json.dump(
+                [{"id": i, "text": t, "metadata": m} for i, t, m in zip(self._ids, self._texts, self._metadatas)],
+                f,
+            )
+        tmp_vectors.replace(self.index_path / VECTORS_FILE)
+        tmp_records.replace(self.index_path / RECORDS_FILE)
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    # ===== Writes =====
+
+    def _reserve(self, extra: int, dim: int):
+        """Make room for `extra` more rows, growing the buffer geometrically"""
+        size = len(self._ids)
+        if self._buffer is not None and size + extra <= len(self._buffer):
+            return
+        capacity = max(size + extra, 2 * size, 1024)
+        buffer = np.empty((capacity, dim), dtype=np.float32)
+        if size:
+            buffer[:size] = self._vectors[:size]
+        self._buffer = buffer
+        self._vectors = buffer[:size]
+
+    def add_embeddings(self, texts: Iterable[str], embeddings: List[List[float]],
+                       metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None,
+                       **kwargs: Any) -> List[str]:
+        """Add precomputed embeddings (persisted on the next flush())"""
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = [str(i) for i in ids] if ids else [uuid.uuid4().hex for _ in texts]
+        new_vectors = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+
+        with self._lock:
+            size = len(self._ids)
+            self._reserve(len(new_vectors), new_vectors.shape[1])
+            self._buffer[size:size + len(new_vectors)] = new_vectors
+            self._ids.extend(ids)
+            self._texts.extend(texts)
+            self._metadatas.extend(dict(m) for m in metadatas)
+            self._vectors = self._buffer[:len(self._ids)]
+            self._dirty = True
+        return ids
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        return self.add_embeddings(texts, self.embedding_function.embed_documents(texts), metadatas, ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Delete vectors by id (persisted on the next flush())"""
+        if not ids:
+            return False
+        to_delete = {str(i) for i in ids}
+        with self._lock:
+            keep = [n for n, i in enumerate(self._ids) if i not in to_delete]
+            if len(keep) == len(self._ids):
+                return False
+            if keep:
+                self._buffer = np.asarray(self._vectors)[keep]
+                self._vectors = self._buffer
+            else:
+                self._buffer = self._vectors = None
+            self._ids = [self._ids[n] for n in keep]
+            self._texts = [self._texts[n] for n in keep]
+            self._metadatas = [self._metadatas[n] for n in keep]
+            self._dirty = True
+        return True
+
+    # ===== Search =====
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               **kwargs: Any) -> List[Tuple[Document, float]]:
+        """Return the k most similar documents with their cosine similarity"""
+        if self._vectors is None or len(self._ids) == 0:
+            return []
+        query = _normalize_rows(np.asarray([embedding], dtype=np.float32))[0]
+        scores = self._vectors @ query
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (Document(page_content=self._texts[n], metadata={**self._metadatas[n], "pk": self._ids[n]}), float(scores[n]))
+            for n in top
+        ]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding_function.embed_query(query), k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Same mapping langchain_milvus applies to COSINE scores, so
+        # score_threshold means the same thing on both backends
+        return lambda score: (score + 1) / 2.0
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   index_path: str = DEFAULT_INDEX_PATH, **kwargs: Any) -> "LocalVectorStore":
+        store = cls(embedding_function=embedding, index_path=index_path)
+        store.add_texts(texts, metadatas=metadatas)
+        store.flush()
+        return store
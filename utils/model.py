@@ -1,4 +1,5 @@
 import logging
+from functools import lru_cache
 from langchain_openai import ChatOpenAI
 import streamlit as st
 
@@ -27,4 +28,34 @@ def get_llm(temperature: float = 0, model: str = DEFAULT_MODEL, streaming: bool
         temperature=temperature,
         streaming=streaming,
         api_key=get_api_key()
-    )
\ No newline at end of file
+    )
+
+@lru_cache(maxsize=None)
+def _get_token_counter(model: str):
+    import tiktoken
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception as e:
+        # tiktoken downloads its BPE file on first use; offline, that fails
+        # unless the file is already in TIKTOKEN_CACHE_DIR
+        from transformers import AutoTokenizer
+        from utils.custom_embeddings import DEFAULT_MODEL_NAME
+        logger.warning(f"tiktoken encoding for {model} unavailable ({e}); approximating token counts "
+                       f"with the {DEFAULT_MODEL_NAME} tokenizer. Set TIKTOKEN_CACHE_DIR to a cached copy "
+                       f"for exact counts.")
+        tokenizer = AutoTokenizer.from_pretrained(DEFAULT_MODEL_NAME, use_fast=True)
+        return lambda text: len(tokenizer.encode(text, add_special_tokens=False, verbose=False))
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    """
+    Count prompt tokens for text with the tokenizer of the given model
+
+    Falls back to an approximate count with the embedding model's tokenizer
+    when tiktoken can't load the encoding (e.g. offline without
+    TIKTOKEN_CACHE_DIR).
+    """
+    return _get_token_counter(model)(text)
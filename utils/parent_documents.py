@@ -0,0 +1,258 @@
+"""
+Parent-document retrieval
+
+Books are split into parent sections at their Markdown headings (the
+converted PDFs keep the book's headings), and each section into small child
+chunks. Only the children are embedded, which makes matching precise; at
+query time the matched children are resolved to their parent sections,
+deduplicated, so synthesis gets a few coherent sections instead of many
+overlapping fragments.
+
+Parent texts live in a local SQLite store next to the other ingestion
+artifacts; children carry the `parent_id` in their metadata.
+"""
+
+import hashlib
+import logging
+import re
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_text_splitters import RecursiveCharacterTextSplitter as Rec
+from pydantic import ConfigDict
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARENT_STORE_PATH = "data/index/parents.db"
+DEFAULT_MAX_PARENTS = 5
+MAX_SECTION_CHARS = 6000  # longer sections are split into several parents
+MIN_SECTION_CHARS = 200   # shorter sections (e.g. a bare heading) are merged into the next one
+CHILD_CHUNK_SIZE = 500
+CHILD_CHUNK_OVERLAP = 100
+
+_HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$", re.MULTILINE)
+
+
+def parent_id_for(source: str, text: str) -> str:
+    """Content-addressed parent id, stable while the section text is unchanged"""
+    return hashlib.sha256(f"{source}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+
+def split_sections(md_content: str, source: str, max_chars: int = MAX_SECTION_CHARS,
+                   min_chars: int = MIN_SECTION_CHARS) -> List[Document]:
+    """
+    Split markdown into parent sections at headings
+
+    Args:
+        md_content: Markdown text of a book
+        source: Source path stored in the metadata
+        max_chars: Sections longer than this are split further
+        min_chars: Sections shorter than this are merged into the following one
+
+    Returns:
+        Parent Documents with source, start_index, section (heading path) and parent_id metadata
+    """
+    # (start offset, heading path) of every section
+    boundaries = [(0, "")]
+    headings: List[str] = []
+    for match in _HEADING_PATTERN.finditer(md_content):
+        level = len(match.group(1))
+        headings = headings[:level - 1] + [match.group(2).strip("*_ ")]
+        boundaries.append((match.start(), " > ".join(h for h in headings if h)))
+
+    sections = []
+    pending_start = None
+    for (start, section), (end, _) in zip(boundaries, boundaries[1:] + [(len(md_content), "")]):
+        if pending_start is not None:
+            start = pending_start
+        if end - start < min_chars and end < len(md_content):
+            pending_start = start
+            continue
+        pending_start = None
+        if md_content[start:end].strip():
+            sections.append((start, end, section))
+
+    splitter = Rec(chunk_size=max_chars, chunk_overlap=0, length_function=len, add_start_index=True)
+    parents = []
+    for start, end, section in sections:
+        text = md_content[start:end]
+        if len(text) <= max_chars:
+            pieces = [(0, text)]
+        else:
+            pieces = []
+            piece_start = None
+            for piece in splitter.create_documents([text]):
+                piece_end = piece.metadata["start_index"] + len(piece.page_content)
+                if piece_start is None:
+                    piece_start = piece.metadata["start_index"]
+                # Keep short pieces (typically the heading) together with what follows
+                if piece_end - piece_start < min_chars:
+                    continue
+                pieces.append((piece_start, text[piece_start:piece_end]))
+                piece_start = None
+            if piece_start is not None:
+                pieces.append((piece_start, text[piece_start:]))
+        for offset, piece in pieces:
+            parents.append(Document(
+                page_content=piece,
+                metadata={
+                    "source": source,
+                    "start_index": start + offset,
+                    "section": section,
+                    "parent_id": parent_id_for(source, piece),
+                },
+            ))
+    return parents
+
+
+def split_children(parents: Iterable[Document], chunk_size: int = CHILD_CHUNK_SIZE,
+                   chunk_overlap: int = CHILD_CHUNK_OVERLAP) -> List[Document]:
+    """Split parent sections into small child chunks that point back to their parent"""
+    splitter = Rec(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len, add_start_index=True)
+    children = []
+    for parent in parents:
+        for child in splitter.create_documents([parent.page_content]):
+            child.metadata = {
+                "source": parent.metadata["source"],
+                "start_index": parent.metadata["start_index"] + child.metadata["start_index"],
+                "parent_id": parent.metadata["parent_id"],
+            }
+            children.append(child)
+    return children
+
+
+class ParentStore:
+    """SQLite store of parent sections keyed by parent_id."""
+
+    def __init__(self, path: str = DEFAULT_PARENT_STORE_PATH):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.initialize_store()
+
+    def create_connection(self):
+        """Create and return a store connection."""
+        return sqlite3.connect(self.path)
+
+    def initialize_store(self):
+        """Create the parents table if it doesn't exist."""
+        conn = self.create_connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS parents (
+                parent_id TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                start_index INTEGER NOT NULL,
+                section TEXT,
+                text TEXT NOT NULL
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_parents_source ON parents (source)")
+        conn.commit()
+        conn.close()
+
+    def replace_source(self, source: str, parents: List[Document]):
+        """Store a source's parent sections, dropping ones that no longer exist"""
+        conn = self.create_connection()
+        try:
+            keep = [parent.metadata["parent_id"] for parent in parents]
+            conn.execute("CREATE TEMP TABLE keep_ids (parent_id TEXT PRIMARY KEY)")
+            conn.executemany("INSERT OR IGNORE INTO keep_ids VALUES (?)", [(parent_id,) for parent_id in keep])
+            conn.execute(
+                "DELETE FROM parents WHERE source = ? AND parent_id NOT IN (SELECT parent_id FROM keep_ids)",
+                (source,),
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO parents (parent_id, source, start_index, section, text) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (parent.metadata["parent_id"], source, parent.metadata["start_index"],
+                     parent.metadata.get("section"), parent.page_content)
+                    for parent in parents
+                ],
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def retain_sources(self, sources: Iterable[str]):
+        """Delete the parents of every source not in `sources` (e.g. books removed from the corpus)"""
+        sources = set(sources)
+        conn = self.create_connection()
+        try:
+            stored = [row[0] for row in conn.execute("SELECT DISTINCT source FROM parents")]
+            removed = [source for source in stored if source not in sources]
+            conn.executemany("DELETE FROM parents WHERE source = ?", [(source,) for source in removed])
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_many(self, parent_ids: List[str]) -> Dict[str, Document]:
+        """Fetch parent sections by id"""
+        found = {}
+        conn = self.create_connection()
+        try:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(parent_ids), 500):
+                batch = parent_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT parent_id, source, start_index, section, text FROM parents WHERE parent_id IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for parent_id, source, start_index, section, text in rows:
+                    found[parent_id] = Document(
+                        page_content=text,
+                        metadata={"source": source, "start_index": start_index,
+                                  "section": section, "parent_id": parent_id},
+                    )
+        finally:
+            conn.close()
+        return found
+
+
+class ParentDocumentRetriever(BaseRetriever):
+    """Resolve child-chunk hits to their deduplicated parent sections."""
+
+    child_retriever: BaseRetriever
+    parent_store: ParentStore
+    max_parents: int = DEFAULT_MAX_PARENTS
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        children = self.child_retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+
+        # Parents in the order of their best-ranked child
+        ranked: List[str] = []
+        hits: Dict[str, int] = {}
+        unparented: List[Document] = []
+        for child in children:
+            parent_id = child.metadata.get("parent_id")
+            if parent_id is None:
+                unparented.append(child)  # chunk ingested without parents
+                continue
+            if parent_id not in hits:
+                ranked.append(parent_id)
+            hits[parent_id] = hits.get(parent_id, 0) + 1
+
+        parents = self.parent_store.get_many(ranked[:self.max_parents])
+        documents = []
+        for parent_id in ranked[:self.max_parents]:
+            parent = parents.get(parent_id)
+            if parent is None:
+                # Parent replaced by a newer ingestion; fall back to the child chunks
+                documents.extend(child for child in children if child.metadata.get("parent_id") == parent_id)
+                continue
+            parent.metadata["child_hits"] = hits[parent_id]
+            documents.append(parent)
+        documents.extend(unparented[:max(0, self.max_parents - len(documents))])
+
+        logger.info(f"Parent retrieval: {len(children)} child chunks -> {len(documents)} sections")
+        return documents
@@ -0,0 +1,66 @@
+"""
+Cross-encoder reranking of retrieved chunks
+
+The retriever returns up to 25 chunks; a local cross-encoder scores each
+(question, chunk) pair jointly and only the top-N are kept for synthesis,
+which shrinks the prompt without another LLM call.
+"""
+
+import logging
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from langchain_core.documents import Document
+from sentence_transformers import CrossEncoder
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+DEFAULT_TOP_N = 6
+
+_cross_encoders = {}
+_cross_encoder_lock = threading.Lock()
+
+
+def get_cross_encoder(model_name: str = DEFAULT_RERANK_MODEL) -> CrossEncoder:
+    """Return the shared CrossEncoder for model_name, loading it on first use"""
+    with _cross_encoder_lock:
+        if model_name not in _cross_encoders:
+            start = time.perf_counter()
+            _cross_encoders[model_name] = CrossEncoder(model_name)
+            logger.info(f"Loaded cross-encoder {model_name} in {time.perf_counter() - start:.2f}s")
+        return _cross_encoders[model_name]
+
+
+def rerank_documents(query: str, documents: List[Document], top_n: int = DEFAULT_TOP_N,
+                     model_name: str = DEFAULT_RERANK_MODEL,
+                     min_score: Optional[float] = None) -> List[Tuple[Document, float]]:
+    """
+    Score documents against the query and keep the best top_n
+
+    Args:
+        query: Search query or question
+        documents: Retrieved documents
+        top_n: Number of documents to keep
+        model_name: Cross-encoder model
+        min_score: Optionally drop documents scoring below this logit
+
+    Returns:
+        List of (document, score), best first
+    """
+    if not documents:
+        return []
+    scores = get_cross_encoder(model_name).predict(
+        [(query, document.page_content) for document in documents],
+        show_progress_bar=False,
+    )
+    ranked = sorted(zip(documents, (float(s) for s in scores)), key=lambda pair: pair[1], reverse=True)
+    if min_score is not None:
+        ranked = [pair for pair in ranked if pair[1] >= min_score]
+    return ranked[:top_n]
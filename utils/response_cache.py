@@ -0,0 +1,117 @@
+"""
+Semantic response cache
+
+Caches generated answers keyed by (normalized question, user_level, hash of
+the context the answer was generated from). A lookup matches the exact
+normalized question, or, among entries with the same level and context
+hash, a question whose embedding cosine similarity is above a threshold.
+Entries expire after a TTL and the cache is LRU-bounded.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+from utils.embedding_cache import normalize_query
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIMILARITY_THRESHOLD = 0.95
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 86400  # seconds
+NO_CONTEXT = "direct"  # context hash for answers generated without retrieval
+
+
+def context_hash(context: Optional[str]) -> str:
+    """Hash of the reference material an answer was generated from"""
+    if not context:
+        return NO_CONTEXT
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """In-process LRU/TTL cache of generated answers with near-duplicate question matching."""
+
+    def __init__(self, embeddings: Embeddings, similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL):
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # (normalized question, level, context hash) -> (unit question vector, response, stored_at)
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _expire(self):
+        now = time.monotonic()
+        for stale_key in [k for k, (_, _, stored_at) in self._entries.items() if now - stored_at >= self.ttl]:
+            del self._entries[stale_key]
+            self._stats["expirations"] += 1
+
+    def get(self, question: str, user_level: str, context_key: str) -> Optional[str]:
+        """Return a cached response for the question, level and context, or None"""
+        user_level = (user_level or "").lower()
+        key = (normalize_query(question), user_level, context_key)
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["exact_hits"] += 1
+                return entry[1]
+            candidates = [k for k in self._entries if k[1] == user_level and k[2] == context_key]
+
+        if candidates:
+            vector = self._embed(question)
+            with self._lock:
+                candidates = [k for k in candidates if k in self._entries]
+                if candidates:
+                    scores = np.stack([self._entries[k][0] for k in candidates]) @ vector
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity_threshold:
+                        self._entries.move_to_end(candidates[best])
+                        self._stats["semantic_hits"] += 1
+                        return self._entries[candidates[best]][1]
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, question: str, user_level: str, context_key: str, response: str):
+        """Store a generated response"""
+        key = (normalize_query(question), (user_level or "").lower(), context_key)
+        vector = self._embed(question)
+        with self._lock:
+            self._entries[key] = (vector, response, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, float]:
+        """Return hit/miss/eviction counters and the overall hit rate"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["exact_hits"] + stats["semantic_hits"]) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,151 @@
+"""
+Semantic retrieval-result cache
+
+Wraps a retriever and serves repeated or near-duplicate queries (e.g. the
+rewrites produced by optimize_query) from memory. Queries match either on
+normalized text or on query-embedding cosine similarity above a threshold.
+Entries expire after a TTL, the cache is LRU-bounded, and everything is
+dropped when the ingestion manifest generation changes, i.e. whenever
+ingestion modified the collection.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict, PrivateAttr
+
+from utils.embedding_cache import normalize_query
+from utils.ingestion_manifest import DEFAULT_MANIFEST_PATH
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIMILARITY_THRESHOLD = 0.95
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL = 1800  # seconds
+
+
+def read_collection_generation(manifest_path: str = DEFAULT_MANIFEST_PATH) -> Optional[int]:
+    """Return the manifest generation, or None if there is no manifest"""
+    try:
+        with open(manifest_path, "r") as f:
+            return json.load(f).get("generation")
+    except (OSError, ValueError):
+        return None
+
+
+class CachedRetriever(BaseRetriever):
+    """Retriever wrapper with exact and near-duplicate query matching."""
+
+    retriever: BaseRetriever
+    embeddings: Embeddings
+    similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD
+    max_entries: int = DEFAULT_MAX_ENTRIES
+    ttl: float = DEFAULT_TTL
+    manifest_path: str = DEFAULT_MANIFEST_PATH
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    # key -> (unit query vector, documents, stored_at)
+    _entries: OrderedDict = PrivateAttr(default_factory=OrderedDict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _generation: Optional[int] = PrivateAttr(default=None)
+    _manifest_mtime: Optional[float] = PrivateAttr(default=None)
+    _stats: Dict[str, int] = PrivateAttr(
+        default_factory=lambda: {"exact_hits": 0, "semantic_hits": 0, "misses": 0,
+                                 "evictions": 0, "expirations": 0, "invalidations": 0}
+    )
+
+    def _check_generation(self):
+        """Drop every entry if ingestion changed the collection since they were stored"""
+        try:
+            mtime = Path(self.manifest_path).stat().st_mtime
+        except OSError:
+            mtime = None
+        if mtime == self._manifest_mtime:
+            return
+        self._manifest_mtime = mtime
+        generation = read_collection_generation(self.manifest_path)
+        if generation != self._generation:
+            if self._entries:
+                logger.info(f"Collection changed (generation {self._generation} -> {generation}), clearing retrieval cache")
+                self._stats["invalidations"] += 1
+            self._entries.clear()
+            self._generation = generation
+
+    def _lookup(self, key: str, vector: Optional[np.ndarray]) -> Optional[List[Document]]:
+        now = time.monotonic()
+        for stale_key in [k for k, (_, _, stored_at) in self._entries.items() if now - stored_at >= self.ttl]:
+            del self._entries[stale_key]
+            self._stats["expirations"] += 1
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self._stats["exact_hits"] += 1
+            return entry[1]
+
+        if vector is None or not self._entries:
+            return None
+        keys = list(self._entries)
+        matrix = np.stack([self._entries[k][0] for k in keys])
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] >= self.similarity_threshold:
+            self._entries.move_to_end(keys[best])
+            self._stats["semantic_hits"] += 1
+            return self._entries[keys[best]][1]
+        return None
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        key = normalize_query(query)
+        with self._lock:
+            self._check_generation()
+            documents = self._lookup(key, None)
+        if documents is not None:
+            return list(documents)
+
+        vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        vector /= max(float(np.linalg.norm(vector)), 1e-12)
+        with self._lock:
+            documents = self._lookup(key, vector)
+            if documents is not None:
+                return list(documents)
+            self._stats["misses"] += 1
+
+        documents = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+
+        with self._lock:
+            self._entries[key] = (vector, list(documents), time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        return documents
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, float]:
+        """Return hit/miss/eviction counters and the overall hit rate"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["exact_hits"] + stats["semantic_hits"]) / lookups if lookups else 0.0
+        return stats
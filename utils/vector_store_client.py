@@ -0,0 +1,154 @@
+"""
+Lazily connected, shared vector-store access
+
+The vector store is created on the first search rather than at import, and
+one instance (and so one pooled Milvus connection) is shared by every
+Streamlit session in the process. Searches can run synchronously or on a
+shared thread pool so they don't block the script thread, and connect and
+query timings are recorded for monitoring.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from pydantic import ConfigDict
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SEARCH_THREADS = 8
+LATENCY_WINDOW = 1000  # most recent queries kept for percentiles
+
+
+class VectorStoreMetrics:
+    """Connect time and rolling query latency for the shared vector store."""
+
+    def __init__(self):
+        self.connect_seconds: Optional[float] = None
+        self.queries = 0
+        self.errors = 0
+        self._latencies_ms = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def record_connect(self, seconds: float):
+        self.connect_seconds = seconds
+
+    def record_query(self, milliseconds: float, failed: bool = False):
+        with self._lock:
+            self.queries += 1
+            if failed:
+                self.errors += 1
+            else:
+                self._latencies_ms.append(milliseconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies_ms)
+
+        def pct(p):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))]
+
+        return {
+            "connect_seconds": self.connect_seconds,
+            "queries": self.queries,
+            "errors": self.errors,
+            "query_ms_p50": pct(50),
+            "query_ms_p95": pct(95),
+            "query_ms_max": latencies[-1] if latencies else None,
+        }
+
+
+class SharedVectorStore:
+    """Create a vector store once, on first use, and share it across threads."""
+
+    def __init__(self, factory: Callable[[], VectorStore]):
+        self.factory = factory
+        self.metrics = VectorStoreMetrics()
+        self._store: Optional[VectorStore] = None
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def get(self) -> VectorStore:
+        if self._store is not None:
+            return self._store
+        with self._lock:
+            if self._store is None:
+                start = time.perf_counter()
+                self._store = self.factory()
+                self.metrics.record_connect(time.perf_counter() - start)
+                logger.info(f"Vector store connected in {self.metrics.connect_seconds:.2f}s")
+            return self._store
+
+    @property
+    def is_connected(self) -> bool:
+        return self._store is not None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=SEARCH_THREADS, thread_name_prefix="vector-search")
+            return self._executor
+
+    def connect_in_background(self) -> Future:
+        """Start connecting without blocking the caller"""
+        return self.executor.submit(self.get)
+
+    def search(self, query: str, k: int, score_threshold: Optional[float] = None) -> List[Document]:
+        """Similarity search with relevance scores, timed"""
+        store = self.get()
+        start = time.perf_counter()
+        failed = False
+        try:
+            kwargs = {"score_threshold": score_threshold} if score_threshold is not None else {}
+            results = store.similarity_search_with_relevance_scores(query, k=k, **kwargs)
+            return [document for document, _ in results]
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.metrics.record_query((time.perf_counter() - start) * 1000, failed=failed)
+
+    def submit_search(self, query: str, k: int, score_threshold: Optional[float] = None) -> Future:
+        """Run search on the shared thread pool and return a Future"""
+        return self.executor.submit(self.search, query, k, score_threshold)
+
+    async def asearch(self, query: str, k: int, score_threshold: Optional[float] = None) -> List[Document]:
+        """Awaitable search that runs on the shared thread pool"""
+        return await asyncio.wrap_future(self.submit_search(query, k, score_threshold))
+
+
+class LazyVectorStoreRetriever(BaseRetriever):
+    """
+    similarity_score_threshold retriever over a SharedVectorStore.
+
+    Constructing it doesn't connect; the first query does.
+    """
+
+    shared_store: SharedVectorStore
+    k: int = 25
+    score_threshold: Optional[float] = None
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.shared_store.search(query, self.k, self.score_threshold)
+
+    async def _aget_relevant_documents(self, query: str, *,
+                                       run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        return await self.shared_store.asearch(query, self.k, self.score_threshold)